@@ -0,0 +1,8 @@
+# coding=utf-8
+"""
+Benchmarks for elib
+
+They are not part of the test suite; run them explicitly, e.g.:
+
+    python -m benchmarks.download --sizes 1K,1M,64M,4G --modes stream,segmented
+"""
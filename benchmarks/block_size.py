@@ -0,0 +1,142 @@
+# coding=utf-8
+"""
+Compares the adaptive block size controller of elib.downloader with the previous heuristic
+
+The previous heuristic recomputed the block size from the last block alone, halving or doubling it at every read.
+Both are run against the same local links (unlimited, bandwidth limited, and bandwidth limited with jitter) and
+compared on throughput, CPU time per MB, number of reads, and number of swings (block size changes of 50% or
+more from one read to the next).
+
+Usage:
+
+    python -m benchmarks.block_size --size 256M --repeat 5
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+import typing
+
+from benchmarks.server import parse_size, serve
+from elib.downloader import Downloader, NullProgress, _downloader
+from elib.downloader._block_size import BlockSizeController
+
+MB = 1024 * 1024
+
+SCENARIOS = {
+    'unlimited': {},
+    'bandwidth': {'bandwidth': 50 * MB},
+    'jitter': {'bandwidth': 50 * MB, 'jitter': 0.002},
+    'slow': {'bandwidth': 4 * MB, 'jitter': 0.01},
+}
+
+
+class LegacyController(BlockSizeController):
+    """
+    Previous heuristic: the rate of the last block, bounded to half and twice its size
+    """
+
+    def update(self, received: int, elapsed: float, block_size: int) -> int:
+        new_min = max(received / 2.0, 1.0)
+        new_max = min(max(received * 2.0, 1.0), self.maximum)
+        if elapsed < 0.001:
+            return int(new_max)
+        rate = received / elapsed
+        return int(max(min(rate, new_max), new_min))
+
+
+CONTROLLERS = {
+    'ewma': BlockSizeController,
+    'legacy': LegacyController,
+}
+
+
+def _swings(block_sizes: typing.List[int]) -> int:
+    return sum(1 for previous, current in zip(block_sizes, block_sizes[1:])
+               if max(previous, current) >= 1.5 * min(previous, current))
+
+
+def _run_case(controller: str, url: str, queue):
+    sys.stderr = open(os.devnull, 'w')
+    _downloader.BlockSizeController = CONTROLLERS[controller]
+    with tempfile.TemporaryDirectory() as folder:
+        downloader = Downloader(url, os.path.join(folder, 'outfile'), stream=True, progress=NullProgress())
+        start_cpu = time.process_time()
+        start = time.perf_counter()
+        success = downloader.download()
+        wall = time.perf_counter() - start
+        cpu = time.process_time() - start_cpu
+    queue.put({
+        'success': success,
+        'wall': wall,
+        'cpu': cpu,
+        'swings': _swings(downloader.metrics.block_sizes),
+        'reads': downloader.metrics.blocks,
+    })
+
+
+def run(size: int, repeat: int, scenarios: typing.Iterable[str]) -> typing.List[dict]:
+    """
+    Args:
+        size: size of the content to download
+        repeat: runs per case; the median is kept
+        scenarios: keys of SCENARIOS
+
+    Returns: one result per scenario and controller
+
+    """
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for scenario in scenarios:
+        stop = context.Event()
+        queue = context.Queue()
+        server = context.Process(target=serve, args=(SCENARIOS[scenario], queue, stop), daemon=True)
+        server.start()
+        url = f'{queue.get()}/{size}'
+        try:
+            for controller in CONTROLLERS:
+                runs = []
+                for _ in range(repeat):
+                    process = context.Process(target=_run_case, args=(controller, url, queue))
+                    process.start()
+                    runs.append(queue.get())
+                    process.join()
+                wall = statistics.median(run['wall'] for run in runs)
+                cpu = statistics.median(run['cpu'] for run in runs)
+                results.append({
+                    'scenario': scenario,
+                    'controller': controller,
+                    'success': all(run['success'] for run in runs),
+                    'mb_per_s': size / MB / wall,
+                    'cpu_ms_per_mb': cpu * 1000 / (size / MB),
+                    'reads': statistics.median(run['reads'] for run in runs),
+                    'swings': statistics.median(run['swings'] for run in runs),
+                })
+        finally:
+            stop.set()
+            server.join()
+    return results
+
+
+def main(argv: typing.Optional[typing.List[str]] = None):
+    """
+    Runs the comparison and prints a table of results
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size', default='256M', help='size of the content, e.g. 64M or 1G')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per case; the median is reported')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f'among: {", ".join(SCENARIOS)}')
+    args = parser.parse_args(argv)
+
+    print(f'{"scenario":>10} {"controller":>10} {"MB/s":>8} {"CPU ms/MB":>10} {"reads":>7} {"swings":>7}')
+    for result in run(parse_size(args.size), args.repeat, args.scenarios.split(',')):
+        print(f'{result["scenario"]:>10} {result["controller"]:>10} {result["mb_per_s"]:8.1f} '
+              f'{result["cpu_ms_per_mb"]:10.2f} {result["reads"]:7.0f} {result["swings"]:7.0f}'
+              f'{"" if result["success"] else "  FAILED"}', flush=True)
+
+
+if __name__ == '__main__':
+    main()
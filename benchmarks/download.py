@@ -0,0 +1,234 @@
+# coding=utf-8
+"""
+Throughput benchmark for elib.downloader
+
+Every case downloads synthetic content from a local BenchmarkServer and reports throughput (MB/s), wall time,
+CPU time and peak resident memory. The server and every case run in processes of their own, so that CPU time
+and peak RSS only account for the download being measured.
+
+Usage:
+
+    python -m benchmarks.download --sizes 1K,1M,64M,1G,4G --modes memory,stream,segmented \\
+        --latency 0.05 --bandwidth 50M --json results.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import typing
+from queue import Empty
+
+from benchmarks.server import content_hash, parse_size, serve
+from elib.downloader import Downloader, NullProgress, async_download, download
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore
+
+MB = 1024 * 1024
+
+
+def _mode_memory(url: str, outfile: str, hexdigest: typing.Optional[str], options: dict) -> bool:
+    return Downloader(url, outfile, hexdigest=hexdigest, block_size=options['block_size'],
+                      progress=NullProgress()).download()
+
+
+def _mode_stream(url: str, outfile: str, hexdigest: typing.Optional[str], options: dict) -> bool:
+    return Downloader(url, outfile, hexdigest=hexdigest, block_size=options['block_size'], stream=True,
+                      progress=NullProgress()).download()
+
+
+def _mode_segmented(url: str, outfile: str, hexdigest: typing.Optional[str], options: dict) -> bool:
+    return Downloader(url, outfile, hexdigest=hexdigest, block_size=options['block_size'],
+                      segments=options['segments'], progress=NullProgress()).download()
+
+
+def _mode_function(url: str, outfile: str, hexdigest: typing.Optional[str], _: dict) -> bool:
+    return download(url, outfile, hexdigest=hexdigest)
+
+
+def _mode_async(url: str, outfile: str, hexdigest: typing.Optional[str], options: dict) -> bool:
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(async_download(url, outfile, hexdigest=hexdigest,
+                                                      block_size=options['block_size']))
+    finally:
+        loop.close()
+
+
+MODES: typing.Dict[str, typing.Callable[[str, str, typing.Optional[str], dict], bool]] = {
+    'memory': _mode_memory,
+    'stream': _mode_stream,
+    'segmented': _mode_segmented,
+    'function': _mode_function,
+    'async': _mode_async,
+}
+
+
+def _peak_rss() -> typing.Optional[int]:
+    if resource is None:  # pragma: no cover
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _failed_result(error: str) -> dict:
+    return {'success': False, 'wall': 0.0, 'cpu': 0.0, 'peak_rss': None, 'error': error}
+
+
+def _run_case(mode: str, url: str, outfile: str, hexdigest: typing.Optional[str], options: dict, queue):
+    sys.stderr = open(os.devnull, 'w')
+    start_cpu = time.process_time()
+    start = time.perf_counter()
+    try:
+        success = MODES[mode](url, outfile, hexdigest, options)
+    except Exception as exc:  # pylint: disable=broad-except
+        queue.put(_failed_result(repr(exc)))
+        return
+    wall = time.perf_counter() - start
+    cpu = time.process_time() - start_cpu
+    queue.put({'success': success, 'wall': wall, 'cpu': cpu, 'peak_rss': _peak_rss(), 'error': None})
+
+
+def run_case(context, mode: str, url: str, hexdigest: typing.Optional[str], options: dict) -> dict:
+    """
+    Runs a single download in a fresh process
+
+    Args:
+        context: multiprocessing context
+        mode: key of MODES
+        url: URL of the content
+        hexdigest: expected MD5 of the content, if it should be verified
+        options: block_size and segments
+
+    Returns: success, wall and CPU time in seconds, peak RSS in bytes, and the error that made the case fail, if
+        any
+
+    """
+    queue = context.Queue()
+    with tempfile.TemporaryDirectory() as folder:
+        process = context.Process(
+            target=_run_case, args=(mode, url, os.path.join(folder, 'outfile'), hexdigest, options, queue),
+        )
+        process.start()
+        while True:
+            try:
+                result = queue.get(timeout=1)
+                break
+            except Empty:
+                if not process.is_alive():
+                    # killed before it could report, e.g. out of memory
+                    result = _failed_result(f'process exited with code {process.exitcode}')
+                    break
+        process.join()
+    return result
+
+
+def _summarize(size: int, mode: str, runs: typing.List[dict]) -> dict:
+    wall = statistics.median(run['wall'] for run in runs)
+    cpu = statistics.median(run['cpu'] for run in runs)
+    rss = [run['peak_rss'] for run in runs if run['peak_rss'] is not None]
+    return {
+        'size': size,
+        'mode': mode,
+        'success': all(run['success'] for run in runs),
+        'runs': len(runs),
+        'wall': wall,
+        'cpu': cpu,
+        'mb_per_s': size / MB / wall if wall else None,
+        'cpu_per_mb': cpu / (size / MB) if size else None,
+        'peak_rss': max(rss) if rss else None,
+        'errors': sorted({run['error'] for run in runs if run['error']}),
+    }
+
+
+def _format(result: dict) -> str:
+    rss = f'{result["peak_rss"] / MB:10.1f}' if result['peak_rss'] is not None else f'{"n/a":>10}'
+    return (f'{result["size"]:>14} {result["mode"]:>10} {result["mb_per_s"] or 0:10.1f} {result["wall"]:9.3f} '
+            f'{result["cpu"]:9.3f} {rss} {"ok" if result["success"] else "FAILED":>7}'
+            f'{"  " + "; ".join(result["errors"]) if result["errors"] else ""}')
+
+
+def _parse_args(argv: typing.Optional[typing.List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', default='1K,1M,64M', help='comma separated sizes, e.g. 1K,1M,1G,4G')
+    parser.add_argument('--modes', default=','.join(MODES), help=f'comma separated modes among: {", ".join(MODES)}')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per case; the median is reported')
+    parser.add_argument('--latency', type=float, default=0.0, help='server delay before every response, in s')
+    parser.add_argument('--bandwidth', default=None, help='per-connection bandwidth, e.g. 10M (bytes per second)')
+    parser.add_argument('--no-ranges', action='store_true', help='do not honor byte-range requests')
+    parser.add_argument('--chunked', action='store_true', help='use chunked transfer encoding')
+    parser.add_argument('--jitter', type=float, default=0.0, help='maximum random delay per 64 KB sent, in s')
+    parser.add_argument('--block-size', type=int, default=4096 * 4, help='initial block size')
+    parser.add_argument('--segments', type=int, default=4, help='connections for the segmented mode')
+    parser.add_argument('--max-memory-size', default='1G', help='skip in-memory modes above this size')
+    parser.add_argument('--no-verify', action='store_true', help='do not check the MD5 of the downloads')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the content pattern')
+    parser.add_argument('--json', help='also write the results to this file')
+    return parser.parse_args(argv)
+
+
+def main(argv: typing.Optional[typing.List[str]] = None):
+    """
+    Runs the benchmark and prints a table of results
+    """
+    args = _parse_args(argv)
+    sizes = [parse_size(size) for size in args.sizes.split(',')]
+    modes = args.modes.split(',')
+    for mode in modes:
+        if mode not in MODES:
+            raise SystemExit(f'unknown mode: {mode}')
+    max_memory_size = parse_size(args.max_memory_size)
+    options = {'block_size': args.block_size, 'segments': args.segments}
+    server_options = {
+        'latency': args.latency,
+        'bandwidth': parse_size(args.bandwidth) if args.bandwidth else None,
+        'ranges': not args.no_ranges,
+        'chunked': args.chunked,
+        'seed': args.seed,
+        'jitter': args.jitter,
+    }
+
+    context = multiprocessing.get_context('spawn')
+    stop = context.Event()
+    queue = context.Queue()
+    server = context.Process(target=serve, args=(server_options, queue, stop), daemon=True)
+    server.start()
+    base_url = queue.get()
+
+    results = []
+    print(f'{"size":>14} {"mode":>10} {"MB/s":>10} {"wall (s)":>9} {"cpu (s)":>9} {"RSS (MB)":>10} {"status":>7}')
+    try:
+        for size in sizes:
+            hexdigest = None if args.no_verify else content_hash(size, args.seed)
+            for mode in modes:
+                if mode in ('memory', 'function') and size > max_memory_size:
+                    continue
+                runs = [run_case(context, mode, f'{base_url}/{size}', hexdigest, options)
+                        for _ in range(args.repeat)]
+                result = _summarize(size, mode, runs)
+                results.append(result)
+                print(_format(result), flush=True)
+    finally:
+        stop.set()
+        server.join()
+
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump({
+                'python': sys.version,
+                'platform': platform.platform(),
+                'options': vars(args),
+                'results': results,
+            }, json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# coding=utf-8
+"""
+Scaling benchmark for elib.hash_.hash_files
+
+Creates a tree of large and small files, then hashes it one file at a time with get_hash (reading every file
+in memory, as before hash_files existed) and with hash_files using an increasing number of threads.
+
+Usage:
+
+    python -m benchmarks.hashing --large 8x256M --small 2000x4K --method sha256
+"""
+import argparse
+import os
+import tempfile
+import time
+import typing
+
+from benchmarks.server import parse_size
+from elib.hash_ import get_hash, hash_files
+
+MB = 1024 * 1024
+
+
+def _parse_files(spec: str) -> typing.Tuple[int, int]:
+    count, _, size = spec.partition('x')
+    return int(count), parse_size(size)
+
+
+def _create_files(folder: str, specs: typing.List[str]) -> typing.List[str]:
+    paths = []
+    block = os.urandom(MB)
+    for spec in specs:
+        count, size = _parse_files(spec)
+        for index in range(count):
+            path = os.path.join(folder, f'{size}_{index}')
+            with open(path, 'wb') as file:
+                for offset in range(0, size, MB):
+                    file.write(block[:min(MB, size - offset)])
+            paths.append(path)
+    return paths
+
+
+def _sequential(paths: typing.List[str], method: str, _: int):
+    for path in paths:
+        with open(path, 'rb') as file:
+            get_hash(file.read(), method)
+
+
+def _parallel(paths: typing.List[str], method: str, workers: int):
+    hash_files(paths, method, workers=workers)
+
+
+def main(argv: typing.Optional[typing.List[str]] = None):
+    """
+    Runs the benchmark and prints a table of results
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--large', default='8x64M', help='large files, as COUNTxSIZE')
+    parser.add_argument('--small', default='2000x4K', help='small files, as COUNTxSIZE')
+    parser.add_argument('--method', default='sha256', help='hash method')
+    parser.add_argument('--workers', default=None, help='comma separated thread counts (defaults to 1, 2, 4... CPUs)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per case; the fastest is reported')
+    args = parser.parse_args(argv)
+
+    cpus = os.cpu_count() or 1
+    if args.workers:
+        workers = [int(count) for count in args.workers.split(',')]
+    else:
+        workers = sorted({2 ** power for power in range(cpus.bit_length())} | {cpus})
+
+    with tempfile.TemporaryDirectory() as folder:
+        paths = _create_files(folder, [args.large, args.small])
+        total = sum(os.path.getsize(path) for path in paths) / MB
+        print(f'{len(paths)} files, {total:.1f} MB, {cpus} CPUs, {args.method}')
+        print(f'{"case":>20} {"MB/s":>10} {"files/s":>10} {"speedup":>8}')
+
+        cases = [('get_hash', _sequential, 1)] + [(f'hash_files({count})', _parallel, count) for count in workers]
+        baseline = None
+        for name, func, count in cases:
+            elapsed = float('inf')
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                func(paths, args.method, count)
+                elapsed = min(elapsed, time.perf_counter() - start)
+            baseline = baseline or elapsed
+            print(f'{name:>20} {total / elapsed:10.1f} {len(paths) / elapsed:10.0f} {baseline / elapsed:8.2f}',
+                  flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+# coding=utf-8
+"""
+Local HTTP server serving synthetic content of any size
+
+The content of `/<size>` (e.g. `/1024`, `/64M`, `/4G`) is a fixed pseudo-random pattern repeated up to `size`
+bytes, generated on the fly so that several GB can be served without holding them in memory. Latency, jitter,
+bandwidth, byte ranges and chunked encoding are configurable, so that results are reproducible from one
+machine to another.
+"""
+import hashlib
+import http.server
+import random
+import socketserver
+import threading
+import time
+import typing
+
+PATTERN_SIZE = 1024 * 1024
+SEND_SIZE = 64 * 1024
+
+_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_size(size: str) -> int:
+    """
+    Args:
+        size: number of bytes, optionally suffixed with K, M or G
+
+    Returns: number of bytes
+
+    """
+    size = size.strip().upper().rstrip('B')
+    if size and size[-1] in _UNITS:
+        return int(float(size[:-1]) * _UNITS[size[-1]])
+    return int(size)
+
+
+def pattern(seed: int = 0) -> bytes:
+    """
+    Args:
+        seed: seed of the pseudo-random generator
+
+    Returns: block repeated to build the content
+
+    """
+    return random.Random(seed).getrandbits(PATTERN_SIZE * 8).to_bytes(PATTERN_SIZE, 'little')
+
+
+def iter_content(pattern_: bytes, start: int, end: int) -> typing.Iterator[bytes]:
+    """
+    Args:
+        pattern_: block repeated to build the content
+        start: first byte
+        end: last byte, exclusive
+
+    Returns: iterator over the content between `start` and `end`, in pieces of at most SEND_SIZE bytes
+
+    """
+    position = start
+    while position < end:
+        offset = position % len(pattern_)
+        piece = pattern_[offset:offset + min(SEND_SIZE, end - position)]
+        position += len(piece)
+        yield piece
+
+
+def content_hash(size: int, seed: int = 0, method: str = 'md5') -> str:
+    """
+    Args:
+        size: size of the content
+        seed: seed of the content pattern
+        method: hashlib algorithm
+
+    Returns: hexdigest of the content
+
+    """
+    hash_ = hashlib.new(method)
+    for piece in iter_content(pattern(seed), 0, size):
+        hash_.update(piece)
+    return hash_.hexdigest()
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    pattern = b''
+    latency = 0.0
+    bandwidth: typing.Optional[float] = None
+    ranges = True
+    chunked = False
+    jitter = 0.0
+
+    def _send(self, piece: bytes, started: float, sent: int):
+        if self.chunked:
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(piece), piece))
+        else:
+            self.wfile.write(piece)
+        if self.bandwidth:
+            delay = started + (sent + len(piece)) / self.bandwidth - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        if self.jitter:
+            time.sleep(random.uniform(0, self.jitter))
+
+    def _range(self, size: int) -> typing.Optional[typing.Tuple[int, int]]:
+        range_ = self.headers.get('Range')
+        if not range_ or not self.ranges or self.chunked:
+            return None
+        start, end = range_.replace('bytes=', '').split('-')
+        return int(start), min(int(end) + 1 if end else size, size)
+
+    def _send_headers(self) -> typing.Optional[typing.Tuple[int, int]]:
+        try:
+            size = parse_size(self.path.strip('/').split('?')[0])
+        except ValueError:
+            self.send_error(404)
+            return None
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        range_ = self._range(size)
+        if range_ is not None:
+            start, end = range_
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end - 1}/{size}')
+        else:
+            start, end = 0, size
+            self.send_response(200)
+
+        if self.ranges and not self.chunked:
+            self.send_header('Accept-Ranges', 'bytes')
+        if self.chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        else:
+            self.send_header('Content-Length', str(end - start))
+        self.end_headers()
+        return start, end
+
+    def do_HEAD(self):  # noqa: N802
+        self._send_headers()
+
+    def do_GET(self):  # noqa: N802
+        range_ = self._send_headers()
+        if range_ is None:
+            return
+        started = time.monotonic()
+        sent = 0
+        try:
+            for piece in iter_content(self.pattern, *range_):
+                self._send(piece, started, sent)
+                sent += len(piece)
+            if self.chunked:
+                self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def log_message(self, *_):
+        pass
+
+
+class _Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class BenchmarkServer:
+    """
+    Serves synthetic content from a background thread
+
+    Use it as a context manager; `url(size)` gives the address of content of a given size.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+            self,
+            latency: float = 0.0,
+            bandwidth: float = None,
+            ranges: bool = True,
+            chunked: bool = False,
+            seed: int = 0,
+            jitter: float = 0.0,
+    ) -> None:
+        """
+        Args:
+            latency: delay before every response, in seconds
+            bandwidth: maximum rate of every connection, in bytes per second
+            ranges: honor byte-range requests
+            chunked: send bodies with chunked transfer encoding instead of a Content-Length
+            seed: seed of the content pattern
+            jitter: maximum random delay after every 64 KB sent, in seconds, to simulate a noisy link
+        """
+        handler = type('Handler', (_Handler,), {
+            'pattern': pattern(seed),
+            'latency': latency,
+            'bandwidth': bandwidth,
+            'ranges': ranges,
+            'chunked': chunked,
+            'jitter': jitter,
+        })
+        self._server = _Server(('127.0.0.1', 0), handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def url(self, size: int) -> str:
+        """
+        Args:
+            size: size of the content
+
+        Returns: URL of the content
+
+        """
+        return f'http://127.0.0.1:{self._server.server_address[1]}/{size}'
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def serve(options: dict, queue, stop):
+    """
+    Runs a BenchmarkServer until `stop` is set; meant to be the target of a separate process
+
+    Args:
+        options: arguments of BenchmarkServer
+        queue: queue the base URL of the server is put on once it is listening
+        stop: event to set to shut the server down
+
+    """
+    with BenchmarkServer(**options) as server:
+        queue.put(server.url(0).rsplit('/', 1)[0])
+        stop.wait()
@@ -0,0 +1,13 @@
+# coding=utf-8
+"""
+Download content from the Web
+"""
+
+from ._async import AsyncDownloader, AsyncDownloadError, async_download
+from ._cache import DownloadCache
+from ._downloader import REQUESTS_HEADERS, Downloader, download
+from ._many import DownloadResult, download_many
+from ._metrics import DownloadMetrics
+from ._progress import CallbackProgress, NullProgress, ProgressReporter, SharedProgress, TqdmProgress
+from ._rate_limit import RateLimiter, get_global_rate_limit, set_global_rate_limit
+from ._validators import ValidatorStore
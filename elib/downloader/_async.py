@@ -0,0 +1,316 @@
+# coding=utf-8
+"""
+Download content from the Web without blocking the event loop
+
+Transfers run on asyncio streams, so thousands of concurrent downloads cost coroutines rather than threads.
+Only plain HTTP/1.1 GET requests are supported: redirects are followed, and bodies may be sent with a
+Content-Length, chunked, or delimited by the end of the connection.
+"""
+import asyncio
+import functools
+import logging
+import os
+import ssl
+import typing
+import urllib.parse
+from pathlib import Path
+
+import certifi
+
+from ..hash_ import new_hash
+from ._downloader import REQUESTS_HEADERS
+from ._progress import NullProgress, ProgressReporter
+from ._rate_limit import RateLimiter, active_limiters
+
+LOGGER = logging.getLogger('elib')
+
+_REDIRECTS = (301, 302, 303, 307, 308)
+_MAX_REDIRECTS = 5
+
+
+@functools.lru_cache(maxsize=None)
+def _ssl_context() -> ssl.SSLContext:
+    """
+    Returns: the TLS context of all connections, built on first use so the CA bundle is only loaded once
+    """
+    return ssl.create_default_context(cafile=certifi.where())
+
+
+def _host_header(parts: urllib.parse.SplitResult) -> str:
+    """
+    Args:
+        parts: split URL
+
+    Returns: value of the Host header for this URL, without any credentials it may contain
+    """
+    host = parts.hostname or ''
+    if ':' in host:
+        host = f'[{host}]'
+    if parts.port:
+        host = f'{host}:{parts.port}'
+    return host
+
+
+class AsyncDownloadError(Exception):
+    """Raised when a response cannot be obtained"""
+
+
+class _Response:  # pylint: disable=too-few-public-methods
+
+    def __init__(self, status: int, headers: typing.Dict[str, str], reader, writer) -> None:
+        self.status = status
+        self.headers = headers
+        self.reader = reader
+        self.writer = writer
+
+    def close(self):
+        """Closes the underlying connection"""
+        self.writer.close()
+
+
+class AsyncDownloader:  # pylint: disable=too-many-instance-attributes
+    """
+    Downloads files using asyncio
+    """
+
+    def __init__(
+            self,
+            url: str,
+            filename: str,
+            hexdigest=None,
+            download_retries: int = 3,
+            block_size: int = 4096 * 16,
+            hash_method: str = 'md5',
+            timeout: float = 30.0,
+            progress: ProgressReporter = None,
+            rate_limit: RateLimiter = None,
+    ) -> None:
+        self.url = url
+        self.filename = filename
+        self.hexdigest = hexdigest
+        self.max_download_retries = download_retries
+        self.block_size = block_size
+        self.hash_method = hash_method
+        self.timeout = timeout
+        self.progress = progress or NullProgress()
+        self.rate_limit = rate_limit
+        self.content_length: typing.Optional[int] = None
+        self._hash = None
+
+    @property
+    def part_filename(self) -> str:
+        """
+        Temporary file the content is streamed to before being moved to its final location
+        """
+        return f'{self.filename}.part'
+
+    async def _open(self, url: str) -> _Response:
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise AsyncDownloadError(f'unsupported scheme: {parts.scheme}')
+
+        ssl_context = _ssl_context() if parts.scheme == 'https' else None
+        port = parts.port or (443 if ssl_context else 80)
+
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(parts.hostname, port, ssl=ssl_context),
+            self.timeout,
+        )
+        path = urllib.parse.urlunsplit(('', '', parts.path or '/', parts.query, ''))
+        request = [f'GET {path} HTTP/1.1', f'Host: {_host_header(parts)}', 'Accept-Encoding: identity', 'Connection: close']
+        request.extend(f'{key}: {value}' for key, value in REQUESTS_HEADERS.items())
+        writer.write(('\r\n'.join(request) + '\r\n\r\n').encode('latin-1'))
+
+        status_line = await asyncio.wait_for(reader.readline(), self.timeout)
+        try:
+            status = int(status_line.split()[1])
+        except (IndexError, ValueError):
+            writer.close()
+            raise AsyncDownloadError(f'invalid status line: {status_line!r}')
+
+        headers = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), self.timeout)
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+
+        return _Response(status, headers, reader, writer)
+
+    async def _create_response(self) -> typing.Optional[_Response]:
+        LOGGER.debug('Url for request: %s', self.url)
+        url = self.url
+        for attempt in range(self.max_download_retries + 1):
+            try:
+                for _ in range(_MAX_REDIRECTS + 1):
+                    response = await self._open(url)
+                    if response.status not in _REDIRECTS or 'location' not in response.headers:
+                        break
+                    response.close()
+                    url = urllib.parse.urljoin(url, response.headers['location'])
+                    LOGGER.debug('redirected to: %s', url)
+                else:
+                    raise AsyncDownloadError('too many redirects')
+            except (OSError, asyncio.TimeoutError, AsyncDownloadError) as exc:
+                LOGGER.debug('attempt %s failed: %s', attempt + 1, exc)
+                continue
+
+            if response.status >= 500:
+                LOGGER.debug('attempt %s failed: %s', attempt + 1, response.status)
+                response.close()
+                continue
+
+            if response.status >= 400:
+                LOGGER.error('download failed: %s', response.status)
+                response.close()
+                return None
+
+            LOGGER.debug('resource URL: %s', url)
+            return response
+
+        LOGGER.debug('could not create resource URL.')
+        return None
+
+    async def _read_chunked(self, reader) -> typing.AsyncIterator[bytes]:
+        while True:
+            size_line = await asyncio.wait_for(reader.readline(), self.timeout)
+            size = int(size_line.split(b';')[0].strip() or b'0', 16)
+            if size == 0:
+                while (await asyncio.wait_for(reader.readline(), self.timeout)) not in (b'\r\n', b'\n', b''):
+                    pass
+                return
+            while size:
+                block = await asyncio.wait_for(reader.read(min(size, self.block_size)), self.timeout)
+                if not block:
+                    raise asyncio.IncompleteReadError(block, size)
+                size -= len(block)
+                yield block
+            await asyncio.wait_for(reader.readline(), self.timeout)
+
+    async def _read_blocks(self, response: _Response) -> typing.AsyncIterator[bytes]:
+        if response.headers.get('transfer-encoding', '').lower() == 'chunked':
+            async for block in self._read_chunked(response.reader):
+                yield block
+            return
+
+        content_length = response.headers.get('content-length')
+        self.content_length = int(content_length) if content_length is not None else None
+        remaining = self.content_length
+        while remaining is None or remaining > 0:
+            size = self.block_size if remaining is None else min(self.block_size, remaining)
+            block = await asyncio.wait_for(response.reader.read(size), self.timeout)
+            if not block:
+                break
+            if remaining is not None:
+                remaining -= len(block)
+            yield block
+
+        if remaining:
+            raise asyncio.IncompleteReadError(b'', remaining)
+
+    async def _throttle(self, amount: int):
+        for limiter in active_limiters(self.rate_limit):
+            delay = limiter.reserve(amount)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.block_size = max(min(self.block_size, limiter.burst), 1)
+
+    def _check_hash(self) -> typing.Optional[bool]:
+        if self.hexdigest is None:
+            LOGGER.debug('no hash to verify')
+            return None
+
+        if self._hash is None:
+            LOGGER.debug('cannot verify file hash')
+            return False
+
+        if self._hash.hexdigest().upper() == self.hexdigest.upper():
+            LOGGER.debug('file hash verified')
+            return True
+
+        LOGGER.debug('cannot verify file hash')
+        return False
+
+    async def download_to_file(self) -> bool:
+        """
+        Streams the content to a temporary file next to the target
+
+        Returns: True if the complete content was received
+
+        """
+        response = await self._create_response()
+        if response is None:
+            return False
+
+        loop = asyncio.get_event_loop()
+        self._hash = new_hash(self.hash_method) if self.hexdigest is not None else None
+        LOGGER.debug('streaming to: %s', self.part_filename)
+        content_length = response.headers.get('content-length')
+        self.progress.start(self.url, int(content_length) if content_length is not None else None)
+        try:
+            with open(self.part_filename, 'wb') as part_file:
+                async for block in self._read_blocks(response):
+                    if self._hash is not None:
+                        self._hash.update(block)
+                    await loop.run_in_executor(None, part_file.write, block)
+                    self.progress.update(len(block))
+                    await self._throttle(len(block))
+        except (OSError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError) as exc:
+            LOGGER.error('download interrupted: %s', exc)
+            return False
+        finally:
+            self.progress.finish()
+            response.close()
+
+        LOGGER.debug('Download Complete')
+        return True
+
+    def _remove_failed_download(self):
+        for file in (self.part_filename, self.filename):
+            if os.path.exists(file):
+                try:
+                    os.remove(file)
+                except OSError:  # pragma: no cover
+                    pass
+
+    async def download(self) -> bool:
+        """
+        Download content to file
+
+        Returns: success of the operation
+
+        """
+        if await self.download_to_file():
+            check = self._check_hash()
+
+            if check is True or check is None:
+                LOGGER.debug('moving to: %s', self.filename)
+                os.replace(self.part_filename, self.filename)
+                return True
+
+        self._remove_failed_download()
+        return False
+
+
+async def async_download(
+        url: str,
+        outfile: typing.Union[Path, str],
+        hexdigest=None,
+        **kwargs,
+) -> bool:
+    """
+    Download file without blocking the event loop
+
+    Args:
+        url: source
+        outfile: local file to save the content to
+        hexdigest: optional hexdigest to check the download
+        **kwargs: additional arguments passed to AsyncDownloader (hash_method, block_size, timeout, ...)
+
+    Returns: success of the operation
+
+    """
+    outfile = Path(outfile).absolute()
+    LOGGER.info('downloading: %s -> %s', url, outfile)
+    return await AsyncDownloader(url=url, filename=str(outfile), hexdigest=hexdigest, **kwargs).download()
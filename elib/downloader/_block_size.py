@@ -0,0 +1,65 @@
+# coding=utf-8
+"""
+Adaptive block size for downloads
+"""
+import typing
+
+MIN_BLOCK_SIZE = 4096
+MAX_BLOCK_SIZE = 4 * 1024 * 1024
+ALIGNMENT = 4096
+
+
+class BlockSizeController:
+    """
+    Sizes reads so that each one takes about `target_read_time` at the observed throughput
+
+    The throughput is an exponentially weighted moving average of the samples, so a single slow or fast block only
+    nudges the block size instead of halving or doubling it. The block size never changes by more than a factor
+    of two from one read to the next, is rounded down to a multiple of 4 KB, and always stays within the bounds.
+    """
+
+    def __init__(
+            self,
+            minimum: int = MIN_BLOCK_SIZE,
+            maximum: int = MAX_BLOCK_SIZE,
+            target_read_time: float = 0.05,
+            smoothing: float = 0.2,
+    ) -> None:
+        """
+        Args:
+            minimum: smallest block size, in bytes
+            maximum: largest block size, in bytes
+            target_read_time: time a single read should take, in seconds
+            smoothing: weight of the latest sample in the average, between 0 (ignore it) and 1 (only keep it)
+        """
+        if not 0 < minimum <= maximum:
+            raise ValueError(f'invalid block size bounds: {minimum}, {maximum}')
+        if not 0 < smoothing <= 1:
+            raise ValueError(f'smoothing must be in (0, 1]: {smoothing}')
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_read_time = target_read_time
+        self.smoothing = smoothing
+        self.rate: typing.Optional[float] = None
+
+    def update(self, received: int, elapsed: float, block_size: int) -> int:
+        """
+        Args:
+            received: number of bytes received by the last read
+            elapsed: time since the previous read returned, in seconds
+            block_size: current block size
+
+        Returns: size of the next read
+
+        """
+        if elapsed > 0 and received:
+            sample = received / elapsed
+            self.rate = sample if self.rate is None else self.smoothing * sample + (1 - self.smoothing) * self.rate
+
+        if self.rate is None:
+            target = block_size * 2
+        else:
+            target = max(min(self.rate * self.target_read_time, block_size * 2), block_size / 2)
+
+        target = int(target) // ALIGNMENT * ALIGNMENT
+        return max(min(target, self.maximum), self.minimum)
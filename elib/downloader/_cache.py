@@ -0,0 +1,123 @@
+# coding=utf-8
+"""
+Content-addressed cache of verified downloads
+"""
+import logging
+import os
+import shutil
+import threading
+import typing
+from pathlib import Path
+
+LOGGER = logging.getLogger('elib')
+
+
+class DownloadCache:
+    """
+    On-disk cache of downloaded files, keyed by hash method and hexdigest
+
+    Only files whose hash has been verified are stored. When the cache grows over its size limit, the least
+    recently used entries are evicted first.
+    """
+
+    def __init__(
+            self,
+            directory: typing.Union[Path, str],
+            max_size: typing.Optional[int] = None,
+            link: bool = False,
+    ) -> None:
+        """
+        Args:
+            directory: folder holding the cached files; created if needed
+            max_size: maximum total size of the cache in bytes (defaults to unlimited)
+            link: hardlink cached files to their targets when possible instead of copying them; targets then share
+                their content with the cache, and must never be modified in place
+        """
+        self.directory = Path(directory).absolute()
+        self.max_size = max_size
+        self.link = link
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, hash_method: str, hexdigest: str) -> Path:
+        """
+        Args:
+            hash_method: hash method the digest was computed with
+            hexdigest: digest of the content
+
+        Returns: path of the cache entry for this content
+        """
+        return Path(self.directory, f'{hash_method.lower()}-{hexdigest.lower()}')
+
+    def _place(self, source: Path, target: Path):
+        tmp_target = Path(f'{target}.{threading.get_ident()}.tmp')
+        if self.link:
+            try:
+                os.link(str(source), str(tmp_target))
+                os.replace(str(tmp_target), str(target))
+                return
+            except OSError:
+                LOGGER.debug('cannot hardlink %s, copying instead', source)
+        shutil.copyfile(str(source), str(tmp_target))
+        os.replace(str(tmp_target), str(target))
+
+    def fetch(self, hash_method: str, hexdigest: str, target: typing.Union[Path, str]) -> bool:
+        """
+        Places the cached content at target, if present in the cache
+
+        Args:
+            hash_method: hash method the digest was computed with
+            hexdigest: digest of the content
+            target: file to write the content to
+
+        Returns: True if the content was found in the cache
+
+        """
+        entry = self.path_for(hash_method, hexdigest)
+        with self._lock:
+            if not entry.is_file():
+                LOGGER.debug('cache miss: %s', entry.name)
+                return False
+
+            LOGGER.debug('cache hit: %s', entry.name)
+            os.utime(str(entry))
+            self._place(entry, Path(target))
+            return True
+
+    def store(self, source: typing.Union[Path, str], hash_method: str, hexdigest: str):
+        """
+        Adds a verified file to the cache
+
+        Args:
+            source: file whose hash has been verified
+            hash_method: hash method the digest was computed with
+            hexdigest: digest of the content
+
+        """
+        entry = self.path_for(hash_method, hexdigest)
+        with self._lock:
+            LOGGER.debug('caching: %s', entry.name)
+            self._place(Path(source), entry)
+            self._evict()
+
+    def size(self) -> int:
+        """
+        Returns: total size of the cached files, in bytes
+        """
+        return sum(entry.stat().st_size for entry in self.directory.iterdir() if entry.is_file())
+
+    def _evict(self):
+        if self.max_size is None:
+            return
+
+        entries = sorted(
+            (entry.stat().st_mtime, entry.stat().st_size, entry)
+            for entry in self.directory.iterdir() if entry.is_file()
+        )
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= self.max_size:
+                break
+            LOGGER.debug('evicting from cache: %s', entry.name)
+            entry.unlink()
+            total -= size
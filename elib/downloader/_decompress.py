@@ -0,0 +1,166 @@
+# coding=utf-8
+"""
+Streaming decompression and extraction of downloaded content
+"""
+import bz2
+import io
+import logging
+import lzma
+import os
+import tarfile
+import typing
+import urllib.parse
+import zlib
+
+LOGGER = logging.getLogger('elib')
+
+_DECOMPRESSORS = {
+    'gzip': lambda: zlib.decompressobj(16 + zlib.MAX_WBITS),
+    'bz2': bz2.BZ2Decompressor,
+    'xz': lzma.LZMADecompressor,
+}
+
+_SUFFIXES = {
+    '.gz': 'gzip',
+    '.tgz': 'gzip',
+    '.bz2': 'bz2',
+    '.tbz2': 'bz2',
+    '.xz': 'xz',
+    '.txz': 'xz',
+}
+
+COMPRESSION_METHODS = tuple(_DECOMPRESSORS)
+
+DECOMPRESSION_ERRORS = (zlib.error, lzma.LZMAError, EOFError)
+
+OUTPUT_SIZE = 1024 * 1024
+
+
+def detect_compression(url: str) -> typing.Optional[str]:
+    """
+    Args:
+        url: URL of the content
+
+    Returns: compression method matching the extension of the URL, or None
+
+    """
+    path = urllib.parse.urlsplit(url).path.lower()
+    for suffix, method in _SUFFIXES.items():
+        if path.endswith(suffix):
+            return method
+    return None
+
+
+class DecompressingWriter:
+    """
+    Decompresses everything written to it into another file object
+
+    Concatenated compressed streams (e.g. multi-member gzip files) are decompressed one after the other. Output is
+    produced at most OUTPUT_SIZE bytes at a time, so that a small block of highly compressible data never expands
+    all at once in memory.
+    """
+
+    def __init__(self, fileobj, method: str) -> None:
+        if method not in _DECOMPRESSORS:
+            raise ValueError(f'unsupported compression: {method}')
+        self.fileobj = fileobj
+        self.method = method
+        self._decompressor = _DECOMPRESSORS[method]()
+
+    def write(self, data: bytes):
+        """
+        Args:
+            data: compressed data
+        """
+        pending = False
+        while data or pending:
+            if self._decompressor.eof:
+                self._decompressor = _DECOMPRESSORS[self.method]()
+            output = self._decompressor.decompress(data, OUTPUT_SIZE)
+            self.fileobj.write(output)
+            if self._decompressor.eof:
+                data, pending = self._decompressor.unused_data, False
+            else:
+                data, pending = getattr(self._decompressor, 'unconsumed_tail', b''), self._has_pending_output(output)
+
+    def _has_pending_output(self, output: bytes) -> bool:
+        needs_input = getattr(self._decompressor, 'needs_input', None)
+        if needs_input is None:
+            # zlib does not tell whether output is left; a full buffer means there may be
+            return len(output) == OUTPUT_SIZE
+        return not needs_input
+
+    def finish(self):
+        """
+        Makes sure the compressed stream was complete
+        """
+        if not self._decompressor.eof:
+            raise EOFError(f'{self.method} stream ended before the end-of-stream marker')
+
+
+class BlockReader(io.RawIOBase):
+    """
+    Readable file object pulling its data from an iterator of blocks
+
+    Blocks are consumed through a memoryview, so that reading a large block in small pieces does not copy what is
+    left of it at every read.
+    """
+
+    def __init__(self, blocks: typing.Iterator[bytes]) -> None:
+        super(BlockReader, self).__init__()
+        self._blocks = blocks
+        self._buffer = memoryview(b'')
+        self._offset = 0
+        self.received = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while self._offset == len(self._buffer):
+            try:
+                self._buffer = memoryview(next(self._blocks))
+            except StopIteration:
+                return 0
+            self._offset = 0
+            self.received += len(self._buffer)
+        size = min(len(buffer), len(self._buffer) - self._offset)
+        buffer[:size] = self._buffer[self._offset:self._offset + size]
+        self._offset += size
+        return size
+
+    def exhaust(self):
+        """
+        Reads and discards whatever is left
+        """
+        for block in self._blocks:
+            self.received += len(block)
+        self._buffer = memoryview(b'')
+        self._offset = 0
+
+
+def _is_safe(member: tarfile.TarInfo, target: str) -> bool:
+    if not (member.isfile() or member.isdir()):
+        return False
+    path = os.path.realpath(os.path.join(target, member.name))
+    return path == target or path.startswith(target + os.sep)
+
+
+def extract_tar_stream(fileobj, target: str):
+    """
+    Extracts a (possibly compressed) tar archive as it is being read
+
+    Only regular files and directories that end up inside the target folder are extracted.
+
+    Args:
+        fileobj: readable file object
+        target: folder to extract to
+
+    """
+    target = os.path.realpath(target)
+    with tarfile.open(fileobj=fileobj, mode='r|*') as tar:
+        for member in tar:
+            if not _is_safe(member, target):
+                LOGGER.warning('skipping tar member: %s', member.name)
+                continue
+            tar.extract(member, target)
@@ -0,0 +1,986 @@
+# coding=utf-8
+"""
+Download content from the Web
+"""
+import io
+import json
+import logging
+import os
+import shutil
+import tarfile
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import urllib3  # type: ignore
+
+from ..hash_ import BlockDigests, new_hash, verify_blocks
+from ..http_pool import connection_headers, get_http_pool, get_session
+from ._block_size import MAX_BLOCK_SIZE, MIN_BLOCK_SIZE, BlockSizeController
+from ._cache import DownloadCache
+from ._decompress import COMPRESSION_METHODS, DECOMPRESSION_ERRORS, BlockReader, DecompressingWriter, \
+    detect_compression, extract_tar_stream
+from ._metrics import DownloadMetrics
+from ._progress import ProgressReporter, SharedProgress, TqdmProgress
+from ._rate_limit import RateLimiter, active_limiters
+from ._validators import ValidatorStore
+
+LOGGER = logging.getLogger('elib')
+
+REQUESTS_HEADERS = {'User-agent': 'Mozilla/5.0'}
+
+
+def _preallocate(file, size: int):
+    try:
+        if hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(file.fileno(), 0, size)
+        else:
+            file.truncate(size)
+    except OSError as exc:
+        LOGGER.debug('cannot preallocate %s bytes: %s', size, exc)
+
+
+def _discard_response(future):
+    data = future.result()
+    if data is not None:
+        data.close()
+
+
+class Downloader:  # pylint: disable=too-many-instance-attributes,too-many-arguments
+    """
+    Downloads files
+    """
+
+    def __init__(
+            self,
+            url: str,
+            filename: str,
+            content_length: int = None,
+            hexdigest=None,
+            download_retries: int = 3,
+            block_size: int = 4096 * 4,
+            hash_method: str = 'md5',
+            stream: bool = False,
+            segments: int = 1,
+            resume: bool = False,
+            progress: ProgressReporter = None,
+            cache: DownloadCache = None,
+            validators: ValidatorStore = None,
+            rate_limit: RateLimiter = None,
+            mirrors: typing.Sequence[str] = (),
+            stall_timeout: float = None,
+            decompress: str = None,
+            extract: bool = False,
+            metrics_hook: typing.Callable[[DownloadMetrics], None] = None,
+            min_block_size: int = MIN_BLOCK_SIZE,
+            max_block_size: int = MAX_BLOCK_SIZE,
+            block_digests: BlockDigests = None,
+    ) -> None:
+
+        self.url = url
+        self.filename = filename
+        self.content_length = content_length or None
+        self.max_download_retries = download_retries
+        self.block_size = block_size
+        self.block_sizer = BlockSizeController(min_block_size, max_block_size)
+        self.segments = max(segments, 1)
+        self.mirrors = list(mirrors)
+        self.http_pool = get_http_pool(max(self.segments, len(self.mirrors) + 1))
+        self.block_digests = block_digests
+        if hexdigest is None and block_digests is not None:
+            hexdigest, hash_method = block_digests.hexdigest, block_digests.method
+        self.hexdigest = hexdigest
+        self.file_binary_data = None
+
+        self.hash_method = hash_method
+        self._hash = None
+        self.resume = resume
+        self.progress = progress or TqdmProgress()
+        self.cache = cache
+        self.validators = validators
+        self.rate_limit = rate_limit
+        self.not_modified = False
+        self.response_headers: typing.Mapping[str, str] = {}
+        self._conditional_headers: typing.Dict[str, str] = {}
+        self.stall_timeout = stall_timeout
+        self.decompress = detect_compression(url) if decompress == 'auto' else decompress
+        self.extract = extract
+        if self.decompress and self.decompress not in COMPRESSION_METHODS:
+            raise ValueError(f'unsupported compression: {self.decompress}')
+        if (self.decompress or extract) and (resume or self.segments > 1 or block_digests is not None):
+            raise ValueError('decompression and extraction cannot be combined with resume, segments or block digests')
+        if resume and self.segments > 1:
+            raise ValueError('segmented downloads cannot be resumed')
+        self.stream = stream or resume or bool(self.mirrors) or bool(self.decompress) or block_digests is not None
+        self.active_url = url
+        self._standby_mirrors: typing.List[str] = []
+        self.metrics = DownloadMetrics(url)
+        self.metrics_hook = metrics_hook
+
+    @property
+    def part_filename(self) -> str:
+        """
+        Temporary file the content is streamed to before being moved to its final location
+        """
+        return f'{self.filename}.part'
+
+    @property
+    def resume_filename(self) -> str:
+        """
+        Sidecar file holding the information needed to resume an interrupted download
+        """
+        return f'{self.part_filename}.json'
+
+    def _load_resume_state(self) -> typing.Optional[dict]:
+        if not os.path.exists(self.part_filename) or not os.path.exists(self.resume_filename):
+            return None
+
+        try:
+            with open(self.resume_filename) as resume_file:
+                state = json.load(resume_file)
+        except (OSError, ValueError):
+            LOGGER.debug('cannot read resume information: %s', self.resume_filename)
+            return None
+
+        if state.get('url') != self.url:
+            LOGGER.debug('partial download was for another URL: %s', state.get('url'))
+            return None
+
+        if not state.get('etag') and not state.get('last_modified'):
+            LOGGER.debug('partial download cannot be validated against the remote')
+            return None
+
+        state['received'] = os.path.getsize(self.part_filename)
+        return state
+
+    def _save_resume_state(self, received: int):
+        state = {
+            'url': self.url,
+            'etag': self.response_headers.get('ETag'),
+            'last_modified': self.response_headers.get('Last-Modified'),
+            'received': received,
+        }
+        with open(self.resume_filename, 'w') as resume_file:
+            json.dump(state, resume_file)
+
+    def _write_to_file(self):
+
+        with open(self.part_filename, 'wb') as outfile:
+            outfile.write(self.file_binary_data)
+        os.replace(self.part_filename, self.filename)
+
+    def _update_hash(self, block: bytes):
+        if self._hash is not None:
+            self._hash.update(block)
+
+    def _check_hash(self):
+
+        if self.hexdigest is None:
+            LOGGER.debug('no hash to verify')
+            return None
+
+        if self._hash is None:
+            LOGGER.debug('cannot verify file hash')
+            return False
+
+        LOGGER.debug('checking file hash')
+        LOGGER.debug('update hash: %s', self.hexdigest)
+
+        file_hash = self._hash.hexdigest()
+
+        if file_hash.upper() == self.hexdigest.upper():
+            LOGGER.debug('file hash verified')
+            return True
+
+        LOGGER.debug('cannot verify file hash')
+        return False
+
+    @staticmethod
+    def _get_content_length(data):  # pragma: no cover
+
+        content_length = data.headers.get("Content-Length")
+
+        if data.headers.get('Content-Encoding', 'identity').lower() != 'identity':
+            # Content-Length counts encoded bytes, but blocks are read once urllib3 has decoded them
+            LOGGER.debug('content is encoded, its decoded length is unknown')
+            content_length = None
+
+        if content_length is not None:
+            content_length = int(content_length)
+
+        LOGGER.debug('Got content length of: %s', content_length)
+
+        return content_length
+
+    def _create_response(self, method: str = 'GET', headers: dict = None, url: str = None):  # pragma: no cover
+        data = None
+        url = url or self.url
+        LOGGER.debug('Url for request: %s', url)
+
+        if self._conditional_headers:
+            headers = dict(self._conditional_headers, **(headers or {}))
+
+        if self.stream or self.segments > 1 or (headers and 'Range' in headers):
+            # byte counts, offsets and ranges all refer to the content as it is sent
+            headers = dict(headers or {}, **{'Accept-Encoding': 'identity'})
+
+        try:
+            data = self.http_pool.urlopen(method, url,
+                                          headers=connection_headers(headers),
+                                          preload_content=False,
+                                          retries=self.max_download_retries,
+                                          **self._timeout_kwargs())
+
+        except urllib3.exceptions.SSLError:
+            LOGGER.debug('SSL cert not verified')
+
+        except urllib3.exceptions.MaxRetryError:
+            LOGGER.debug('MaxRetryError')
+
+        except Exception as exc:  # pylint: disable=broad-except
+            LOGGER.debug(str(exc), exc_info=True)
+
+        if data is not None:
+            self.metrics.record_response(data)
+
+        if data is not None and data.status >= 400 and data.status != 416:
+            if method == 'GET':
+                LOGGER.error('download failed: %s %s', data.status, data.reason)
+            else:
+                LOGGER.debug('%s request failed: %s %s', method, data.status, data.reason)
+            data.release_conn()
+            data = None
+
+        if data is not None:
+            LOGGER.debug('resource URL: %s', url)
+        else:
+            LOGGER.debug('could not create resource URL.')
+        return data
+
+    def _throttle(self, amount: int):
+        """
+        Waits as long as needed to keep under the rate limits, and keeps blocks no larger than their bursts
+        """
+        for limiter in active_limiters(self.rate_limit):
+            limiter.consume(amount)
+            self.block_size = max(min(self.block_size, limiter.burst), 1)
+
+    def _timeout_kwargs(self) -> dict:
+        if self.stall_timeout is None:
+            return {}
+        return {'timeout': urllib3.Timeout(connect=self.stall_timeout, read=self.stall_timeout)}
+
+    def _open_fastest(self, headers: dict = None):
+        """
+        Requests the content from the URL and all its mirrors at once, keeping the first one to answer
+
+        The remaining mirrors are kept on standby, to switch to if the transfer stalls.
+
+        Args:
+            headers: request headers
+
+        Returns: response of the fastest mirror, or None if none answered
+
+        """
+        if not self.mirrors:
+            return self._create_response(headers=headers)
+
+        candidates = [self.url] + [mirror for mirror in self.mirrors if mirror != self.url]
+        executor = ThreadPoolExecutor(max_workers=len(candidates))
+        futures = {executor.submit(self._create_response, 'GET', headers, url): url for url in candidates}
+        winner = None
+        for future in as_completed(futures):
+            data = future.result()
+            if data is not None:
+                winner = future
+                break
+
+        for future in futures:
+            if future is not winner:
+                future.add_done_callback(_discard_response)
+        executor.shutdown(wait=False)
+
+        if winner is None:
+            return None
+
+        self.active_url = futures[winner]
+        self._standby_mirrors = [url for url in candidates if url != self.active_url]
+        LOGGER.debug('fastest mirror: %s', self.active_url)
+        return winner.result()
+
+    def _failover(self, received_data: int):
+        """
+        Continues the transfer from the next mirror on standby, starting at the first missing byte
+
+        Args:
+            received_data: number of bytes already received
+
+        Returns: response of the mirror, or None if no mirror could continue the transfer
+
+        """
+        while self._standby_mirrors:
+            url = self._standby_mirrors.pop(0)
+            LOGGER.warning('switching to mirror %s at byte %s', url, received_data)
+            data = self._create_response(headers={'Range': f'bytes={received_data}-'}, url=url)
+            if data is None:
+                continue
+            if data.status == 206 and data.headers.get('Content-Range', '').startswith(f'bytes {received_data}-'):
+                self.metrics.failovers += 1
+                self.active_url = url
+                self.response_headers = data.headers
+                return data
+            LOGGER.debug('mirror cannot continue the transfer: %s', url)
+            data.close()
+
+        return None
+
+    def _reset_hash(self):
+        self._hash = None
+        if self.hexdigest is not None:
+            self._hash = new_hash(self.hash_method)
+
+    def _read_block(self, data, buffer: typing.Optional[bytearray]):
+        if buffer is None:
+            return data.read(self.block_size)
+        view = memoryview(buffer)[:self.block_size]
+        return view[:data.readinto(view)]
+
+    def _read_blocks(self, data, offset: int = 0, reuse_buffer: bool = False) -> typing.Iterator[bytes]:
+        """
+        Reads the response body block by block, reporting progress and updating the hash as it goes
+
+        Args:
+            data: response to read from
+            offset: number of bytes of the content already received before this response
+            reuse_buffer: read every block into the same buffer; each block is then only valid until the next
+                one is requested
+
+        Returns: iterator over the blocks of the response body
+
+        """
+        self.content_length = self._get_content_length(data)
+
+        if self.content_length is None:  # pragma: no cover
+            LOGGER.debug('content-Length not in headers')
+            LOGGER.debug('progress will not show time left '
+                         'or percent downloaded.')
+        else:
+            self.content_length += offset
+
+        self.progress.start(self.active_url, self.content_length, offset)
+        try:
+            block = data.read(1)
+            self.metrics.record_block(len(block), 0.0, self.block_size)
+            self._update_hash(block)
+            yield block
+            self.progress.update(len(block))
+
+            buffer = None
+            last_read = time.perf_counter()
+            while 1:
+
+                if reuse_buffer and (buffer is None or len(buffer) < self.block_size):
+                    buffer = bytearray(self.block_size)
+
+                block = self._read_block(data, buffer)
+
+                if not block:
+                    break
+
+                now = time.perf_counter()
+                elapsed, last_read = now - last_read, now
+
+                self.block_size = self.block_sizer.update(len(block), elapsed, self.block_size)
+                self._throttle(len(block))
+                self.metrics.record_block(len(block), elapsed, self.block_size)
+
+                self._update_hash(block)
+                yield block
+
+                self.progress.update(len(block))
+        finally:
+            self.progress.finish()
+        LOGGER.debug('Download Complete')
+
+    def download_to_memory(self):
+        """
+        Download bytes to memory
+        """
+
+        data = self._open_fastest()
+
+        if data is None or self._is_not_modified(data):
+            return None
+
+        self.response_headers = data.headers
+        self._reset_hash()
+        self.file_binary_data = b''.join(self._read_blocks(data))
+
+    def _resume_headers(self) -> typing.Tuple[typing.Optional[dict], int]:
+        state = self._load_resume_state() if self.resume else None
+        if not state or not state['received']:
+            return None, 0
+
+        LOGGER.debug('requesting content from byte %s', state['received'])
+        headers = {
+            'Range': f'bytes={state["received"]}-',
+            'If-Range': state['etag'] or state['last_modified'],
+        }
+        return headers, state['received']
+
+    def download_to_file(self) -> bool:
+        """
+        Streams the content to a temporary file next to the target, block by block
+
+        Peak memory usage is bounded by the block size, regardless of the size of the content: blocks are read into
+        a single reusable buffer, and the temporary file is preallocated when the size of the content is known.
+
+        If resuming is enabled and a partial download of the same, unchanged resource exists, only the missing
+        bytes are requested.
+
+        Returns: True if the complete content was received
+
+        """
+        headers, offset = self._resume_headers()
+
+        data = self._open_fastest(headers)
+
+        if data is None or self._is_not_modified(data):
+            return False
+
+        self.response_headers = data.headers
+
+        if headers and data.status == 416:
+            LOGGER.debug('partial download does not match the remote content, restarting download')
+            data.release_conn()
+            for file in (self.part_filename, self.resume_filename):
+                os.remove(file)
+            return self.download_to_file()
+
+        mode = 'wb'
+        if headers and data.status == 206:
+            if not data.headers.get('Content-Range', '').startswith(f'bytes {offset}-'):
+                LOGGER.error('unexpected content range: %s', data.headers.get('Content-Range'))
+                return False
+            LOGGER.debug('resuming download at byte %s', offset)
+            self._hash_part_file()
+            mode = 'ab'
+        else:
+            if headers:
+                LOGGER.debug('remote content changed, restarting download')
+            offset = 0
+            self._reset_hash()
+
+        LOGGER.debug('streaming to: %s', self.part_filename)
+        received_data = offset
+        if self.resume:
+            self._save_resume_state(received_data)
+        try:
+            with open(self.part_filename, mode) as part_file:
+                content_length = self._get_content_length(data)
+                if mode == 'wb' and content_length and not self.resume and not self.decompress:
+                    _preallocate(part_file, content_length)
+                sink = DecompressingWriter(part_file, self.decompress) if self.decompress else part_file
+                while True:
+                    try:
+                        for block in self._read_blocks(data, offset, reuse_buffer=True):
+                            sink.write(block)
+                            received_data += len(block)
+                        if self.decompress and (self.content_length is None or received_data == self.content_length):
+                            sink.finish()
+                    except DECOMPRESSION_ERRORS as exc:
+                        LOGGER.error('cannot decompress %s: %s', self.active_url, exc)
+                        return False
+                    except (urllib3.exceptions.HTTPError, OSError) as exc:
+                        LOGGER.error('download interrupted after %s bytes: %s', received_data, exc)
+                    else:
+                        if self.content_length is None or received_data == self.content_length:
+                            return True
+                        LOGGER.error('incomplete download: %s out of %s bytes', received_data, self.content_length)
+
+                    data = self._failover(received_data)
+                    if data is None:
+                        return False
+                    offset = received_data
+        finally:
+            if self.resume:
+                self._save_resume_state(received_data)
+
+    def download_and_extract(self) -> bool:
+        """
+        Extracts a tar archive, compressed or not, to a temporary folder next to the target as it arrives
+
+        The archive itself is never written to disk; the hash is computed over the raw bytes received.
+
+        Returns: True if the complete archive was received and extracted
+        """
+        data = self._open_fastest()
+        if data is None:
+            return False
+
+        self.response_headers = data.headers
+        self._reset_hash()
+        if os.path.isdir(self.part_filename):
+            shutil.rmtree(self.part_filename)
+
+        LOGGER.debug('extracting to: %s', self.part_filename)
+        blocks = self._read_blocks(data)
+        reader = BlockReader(blocks)
+        try:
+            extract_tar_stream(io.BufferedReader(reader), self.part_filename)
+            reader.exhaust()
+        except (tarfile.TarError, urllib3.exceptions.HTTPError, OSError) + DECOMPRESSION_ERRORS as exc:
+            LOGGER.error('cannot extract %s: %s', self.active_url, exc)
+            return False
+        finally:
+            blocks.close()
+
+        if self.content_length is not None and reader.received != self.content_length:
+            LOGGER.error('incomplete download: %s out of %s bytes', reader.received, self.content_length)
+            return False
+
+        return True
+
+    def _finalize_extraction(self, success: bool) -> bool:
+        if success and self._check_hash() is not False:
+            LOGGER.debug('moving to: %s', self.filename)
+            if os.path.isdir(self.filename):
+                shutil.rmtree(self.filename)
+            os.replace(self.part_filename, self.filename)
+            return True
+
+        if os.path.isdir(self.part_filename):
+            shutil.rmtree(self.part_filename, ignore_errors=True)
+        return False
+
+    def _prepare_revalidation(self):
+        self.not_modified = False
+        self._conditional_headers = {}
+        if self.validators is not None and self.hexdigest is None and not self.extract:
+            self._conditional_headers = self.validators.headers_for(self.url, self.filename)
+            if self._conditional_headers:
+                LOGGER.debug('revalidating: %s', self._conditional_headers)
+
+    def _is_not_modified(self, data) -> bool:
+        if data.status != 304:
+            return False
+
+        LOGGER.info('not modified: %s', self.url)
+        data.release_conn()
+        self.not_modified = True
+        return True
+
+    def _save_validators(self):
+        if self.validators is not None:
+            self.validators.update(self.url, self.filename, self.response_headers)
+
+    def _fetch_from_cache(self) -> bool:
+        if self.cache is None or self.hexdigest is None or self.decompress or self.extract:
+            return False
+
+        return self.cache.fetch(self.hash_method, self.hexdigest, self.filename)
+
+    def _store_in_cache(self):
+        if self.cache is not None and not self.decompress:
+            self.cache.store(self.filename, self.hash_method, self.hexdigest)
+
+    def _remove_failed_download(self):
+        for file in (self.part_filename, self.resume_filename, self.filename):
+            if os.path.exists(file):
+                try:
+                    os.remove(file)
+                except OSError:  # pragma: no cover
+                    pass
+
+    @staticmethod
+    def _merge_blocks(indices: typing.List[int], block_size: int, size: int) -> typing.List[typing.Tuple[int, int]]:
+        ranges: typing.List[typing.Tuple[int, int]] = []
+        for index in indices:
+            start, end = index * block_size, min((index + 1) * block_size, size) - 1
+            if ranges and ranges[-1][1] == start - 1:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((start, end))
+        return ranges
+
+    def _repair_part_file(self, mismatched: typing.Optional[typing.List[int]] = None) -> bool:
+        """
+        Checks the temporary file block by block, and downloads the blocks that do not match again
+
+        The whole file is hashed again once repaired.
+
+        Args:
+            mismatched: blocks already known not to match; the file is checked first if not given
+
+        Returns: True if all blocks eventually match
+
+        """
+        digests = self.block_digests
+        if os.path.getsize(self.part_filename) > digests.size:
+            os.truncate(self.part_filename, digests.size)
+
+        for attempt in range(self.max_download_retries + 1):
+            if mismatched is None:
+                mismatched = verify_blocks(self.part_filename, digests)
+            if not mismatched:
+                self._hash_part_file()
+                return True
+
+            if attempt == self.max_download_retries:
+                break
+
+            ranges = self._merge_blocks(mismatched, digests.block_size, digests.size)
+            LOGGER.warning('downloading %s corrupt blocks again in %s ranges', len(mismatched), len(ranges))
+            progress = SharedProgress(self.progress)
+            self.progress.start(self.url, sum(end - start + 1 for start, end in ranges))
+            try:
+                with ThreadPoolExecutor(max_workers=self.segments) as executor:
+                    futures = [executor.submit(self._download_range, start, end, progress) for start, end in ranges]
+                    if not all([future.result() for future in futures]):
+                        LOGGER.error('cannot download corrupt blocks again')
+                        return False
+            finally:
+                self.progress.finish()
+            mismatched = None
+
+        LOGGER.error('blocks still corrupt after %s attempts', self.max_download_retries)
+        return False
+
+    def _repair_existing_file(self) -> bool:
+        """
+        Checks a previous version of the content in place, if there is one of the expected size, and repairs a
+        copy of it if some blocks do not match
+
+        The previous version is only replaced once the copy matches all its block digests. Like any other
+        failed download, it is removed if it has bad blocks and the content cannot be downloaded again.
+
+        Returns: True if the file now matches all its block digests
+
+        """
+        if not os.path.isfile(self.filename) or os.path.getsize(self.filename) != self.block_digests.size:
+            return False
+
+        LOGGER.info('checking existing file block by block: %s', self.filename)
+        mismatched = verify_blocks(self.filename, self.block_digests)
+        if not mismatched:
+            LOGGER.info('existing file is intact: %s', self.filename)
+            return True
+
+        shutil.copyfile(self.filename, self.part_filename)
+        if not self._repair_part_file(mismatched):
+            LOGGER.info('cannot repair existing file, downloading it again')
+            return False
+
+        return self._finalize_part_file(True)
+
+    def _finalize_part_file(self, success: bool) -> bool:
+        if success:
+            check = self._check_hash()
+            if check is False and self.block_digests is not None and self._repair_part_file():
+                check = self._check_hash()
+
+            if check is True or check is None:
+                LOGGER.debug('moving to: %s', self.filename)
+                os.replace(self.part_filename, self.filename)
+                if os.path.exists(self.resume_filename):
+                    os.remove(self.resume_filename)
+                if check:
+                    self._store_in_cache()
+                self._save_validators()
+                return True
+
+        elif self.not_modified:
+            return True
+
+        elif self.resume and os.path.exists(self.part_filename):
+            LOGGER.info('keeping partial download for later resumption: %s', self.part_filename)
+            return False
+
+        self._remove_failed_download()
+        return False
+
+    def _download_streaming(self) -> bool:
+        LOGGER.debug('streaming to file')
+        return self._finalize_part_file(self.download_to_file())
+
+    @staticmethod
+    def _split_ranges(content_length: int, segments: int) -> typing.List[typing.Tuple[int, int]]:
+        """
+        Splits content into contiguous byte ranges
+
+        Args:
+            content_length: total size of the content
+            segments: number of ranges to produce
+
+        Returns: list of (first byte, last byte) tuples, both inclusive
+
+        """
+        segments = max(min(segments, content_length), 1)
+        size, remainder = divmod(content_length, segments)
+        ranges = []
+        start = 0
+        for index in range(segments):
+            end = start + size + (1 if index < remainder else 0)
+            ranges.append((start, end - 1))
+            start = end
+        return ranges
+
+    def _probe_ranges(self) -> typing.Optional[int]:
+        """
+        Checks whether the server accepts byte ranges for this resource
+
+        Returns: content length if ranges are supported, None otherwise
+
+        """
+        data = self._create_response('HEAD')
+        if data is None or self._is_not_modified(data):
+            return None
+        data.release_conn()
+        self.response_headers = data.headers
+
+        if data.status >= 400:
+            LOGGER.debug('HEAD request failed: %s', data.status)
+            return None
+
+        if data.headers.get('Accept-Ranges', '').lower() != 'bytes':
+            LOGGER.debug('server does not accept byte ranges')
+            return None
+
+        content_length = self._get_content_length(data)
+        if not content_length:
+            return None
+
+        return content_length
+
+    def _download_range(self, start: int, end: int, progress: SharedProgress) -> bool:
+        data = self._create_response(headers={'Range': f'bytes={start}-{end}'})
+        if data is None:
+            return False
+
+        if data.status != 206:
+            LOGGER.debug('range request not honored: %s', data.status)
+            data.release_conn()
+            return False
+
+        expected = end - start + 1
+        received_data = 0
+        buffer = memoryview(bytearray(self.block_size))
+        try:
+            with open(self.part_filename, 'r+b') as part_file:
+                part_file.seek(start)
+                while received_data < expected:
+                    view = buffer[:min(self.block_size, expected - received_data)]
+                    start_block = time.perf_counter()
+                    block = view[:data.readinto(view)]
+                    end_block = time.perf_counter()
+                    if not block:
+                        break
+                    part_file.write(block)
+                    received_data += len(block)
+                    progress.update(len(block))
+                    self._throttle(len(block))
+                    self.metrics.record_block(len(block), end_block - start_block, self.block_size)
+        except (urllib3.exceptions.HTTPError, OSError) as exc:
+            LOGGER.error('range %s-%s interrupted after %s bytes: %s', start, end, received_data, exc)
+            return False
+        finally:
+            data.release_conn()
+
+        if received_data != expected:
+            LOGGER.debug('range %s-%s incomplete: %s bytes received', start, end, received_data)
+            return False
+
+        return True
+
+    def _hash_part_file(self):
+        self._reset_hash()
+        if self._hash is None:
+            return
+
+        with open(self.part_filename, 'rb') as part_file:
+            for block in iter(lambda: part_file.read(self.block_size), b''):
+                self._hash.update(block)
+
+    def download_segmented(self) -> typing.Optional[bool]:
+        """
+        Downloads the content over several concurrent connections, each fetching its own byte range
+
+        The ranges are written at their offset into a preallocated temporary file next to the target.
+
+        Returns: success of the transfer, or None if the server does not support byte ranges
+
+        """
+        content_length = self._probe_ranges()
+        if content_length is None:
+            return None
+
+        self.content_length = content_length
+        ranges = self._split_ranges(content_length, self.segments)
+        LOGGER.debug('downloading %s bytes in %s segments', content_length, len(ranges))
+
+        with open(self.part_filename, 'wb') as part_file:
+            _preallocate(part_file, content_length)
+
+        progress = SharedProgress(self.progress)
+        self.progress.start(self.url, content_length)
+        try:
+            with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                futures = [executor.submit(self._download_range, start, end, progress)
+                           for start, end in ranges]
+                success = all([future.result() for future in futures])
+        finally:
+            self.progress.finish()
+
+        if success:
+            LOGGER.debug('Download Complete')
+            self._hash_part_file()
+
+        return success
+
+    def _download_parallel(self) -> bool:
+        LOGGER.debug('downloading in %s segments', self.segments)
+        success = self.download_segmented()
+
+        if self.not_modified:
+            return True
+
+        if success is None:
+            LOGGER.debug('falling back to a single stream')
+            return self._download_streaming()
+
+        return self._finalize_part_file(success)
+
+    def download(self) -> bool:
+        """
+        Download content to file
+
+        Timings and throughput of the transfer are then available in `metrics`, and handed to `metrics_hook`.
+
+        Returns: success of the operation
+
+        """
+        self.metrics = DownloadMetrics(self.url)
+        success = False
+        try:
+            success = self._download()
+        finally:
+            self.metrics.not_modified = self.not_modified
+            self.metrics.finish(success, self.active_url)
+            LOGGER.debug('download metrics: %s', self.metrics.as_dict())
+            if self.metrics_hook is not None:
+                self.metrics_hook(self.metrics)
+        return success
+
+    def _download(self) -> bool:
+        if self._fetch_from_cache():
+            self.metrics.cached = True
+            return True
+
+        if self.block_digests is not None and self._repair_existing_file():
+            return True
+
+        self._prepare_revalidation()
+
+        if self.extract:
+            return self._finalize_extraction(self.download_and_extract())
+
+        if self.segments > 1:
+            return self._download_parallel()
+
+        if self.stream:
+            return self._download_streaming()
+
+        LOGGER.debug('downloading to memory')
+        self.download_to_memory()
+
+        if self.not_modified:
+            return True
+
+        check = self._check_hash() if self.file_binary_data is not None else False
+
+        if check is True or check is None:
+            LOGGER.debug('writing to file')
+            self._write_to_file()
+            if check:
+                self._store_in_cache()
+            self._save_validators()
+            return True
+
+        del self.file_binary_data
+        self._remove_failed_download()
+        return False
+
+
+def download(
+        url: str,
+        outfile: typing.Union[Path, str],
+        hexdigest=None,
+        stream: bool = False,
+        segments: int = 1,
+        resume: bool = False,
+        cache: DownloadCache = None,
+        validators: ValidatorStore = None,
+        probe: bool = False,
+        rate_limit: RateLimiter = None,
+        mirrors: typing.Sequence[str] = (),
+        decompress: str = None,
+        extract: bool = False,
+        metrics_hook: typing.Callable[[DownloadMetrics], None] = None,
+        block_digests: BlockDigests = None,
+) -> bool:
+    """
+    Download file
+
+    Args:
+        url: source
+        outfile: local file to save the content to
+        hexdigest: optional hexdigest to check the download
+        stream: write the content to disk as it arrives instead of buffering it in memory
+        segments: number of concurrent byte-range connections to use if the server supports them
+        resume: keep partial downloads on failure and continue them on the next attempt; cannot be combined with
+            segments
+        cache: cache of verified downloads to look the hexdigest up in before downloading
+        validators: store of HTTP validators used to skip unchanged content when no hexdigest is given
+        probe: check the URL with a HEAD request before downloading; by default, the status of the GET
+            request itself is used, saving a round-trip
+        rate_limit: bandwidth limit for this download, on top of the global one
+        mirrors: alternative URLs for the same content; the fastest to answer is used, and the others take over
+            if the transfer fails midway
+        decompress: decompress the content as it arrives: "gzip", "bz2", "xz", or "auto" to pick one from the
+            extension of the URL
+        extract: extract the content, a tar archive, into `outfile` as it arrives; `outfile` is then a folder
+        metrics_hook: callable receiving the DownloadMetrics of the transfer once it is over
+        block_digests: hashes of the blocks of the content, as returned by elib.hash_.hash_file_blocks; blocks
+            that do not match, in the download or in an existing copy of `outfile`, are downloaded again
+
+    Returns: success of the operation
+
+    """
+    outfile = Path(outfile).absolute()
+    LOGGER.info('downloading: %s', locals())
+    if probe:
+        resp = get_session().head(url, headers=REQUESTS_HEADERS, timeout=5)
+        if not resp.ok:
+            if resp.reason not in ['Method Not Allowed']:
+                LOGGER.error('download failed: %s', resp.reason)
+                return False
+
+    LOGGER.debug('processing download request')
+
+    return Downloader(
+        url=url,
+        filename=str(outfile),
+        hexdigest=hexdigest,
+        stream=stream,
+        segments=segments,
+        resume=resume,
+        cache=cache,
+        validators=validators,
+        rate_limit=rate_limit,
+        mirrors=mirrors,
+        decompress=decompress,
+        extract=extract,
+        metrics_hook=metrics_hook,
+        block_digests=block_digests,
+    ).download()
@@ -0,0 +1,105 @@
+# coding=utf-8
+"""
+Downloads many files concurrently
+"""
+import logging
+import shutil
+import typing
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from ..http_pool import get_http_pool
+from ._downloader import Downloader
+from ._progress import ProgressReporter, SharedProgress, TqdmProgress
+
+LOGGER = logging.getLogger('elib')
+
+DownloadResult = namedtuple('DownloadResult', 'url outfile success error')
+
+_DownloadItem = typing.Union[
+    typing.Tuple[str, typing.Union[Path, str]],
+    typing.Tuple[str, typing.Union[Path, str], typing.Optional[str]],
+]
+
+
+def _group_items(items: typing.Iterable[_DownloadItem]) -> 'OrderedDict[str, typing.List[tuple]]':
+    groups: 'OrderedDict[str, typing.List[tuple]]' = OrderedDict()
+    for index, item in enumerate(items):
+        url, outfile, hexdigest = (tuple(item) + (None,))[:3]
+        groups.setdefault(url, []).append((index, Path(outfile).absolute(), hexdigest))
+    return groups
+
+
+def _same_digest(hexdigest: typing.Optional[str], other: typing.Optional[str]) -> bool:
+    return hexdigest is None or other is None or hexdigest.upper() == other.upper()
+
+
+def download_many(
+        items: typing.Iterable[_DownloadItem],
+        max_workers: int = 4,
+        progress: ProgressReporter = None,
+        **kwargs,
+) -> typing.List[DownloadResult]:
+    """
+    Downloads several files concurrently, reporting the progress of the whole batch at once
+
+    Identical URLs are only downloaded once; the other targets receive a copy of the downloaded file.
+
+    Args:
+        items: (url, outfile, hexdigest) tuples; hexdigest is optional
+        max_workers: maximum number of concurrent downloads
+        progress: reporter receiving the bytes of all downloads (defaults to a single tqdm bar)
+        **kwargs: additional arguments passed to each Downloader (hash_method, stream, segments, ...)
+
+    Returns: one DownloadResult per item, in the same order as the items
+
+    """
+    groups = _group_items(items)
+    results: typing.List[typing.Optional[DownloadResult]] = [None] * sum(len(group) for group in groups.values())
+    LOGGER.info('downloading %s files from %s URLs', len(results), len(groups))
+
+    get_http_pool(max_workers * max(kwargs.get('segments', 1), len(kwargs.get('mirrors', ())) + 1))
+
+    progress = progress or TqdmProgress()
+    shared_progress = SharedProgress(progress)
+
+    def _download_group(url: str, group: typing.List[tuple]):
+        index, outfile, _ = group[0]
+        hexdigest = next((digest for _, _, digest in group if digest), None)
+        try:
+            success = Downloader(
+                url=url,
+                filename=str(outfile),
+                hexdigest=hexdigest,
+                progress=shared_progress,
+                **kwargs,
+            ).download()
+            error = None if success else 'download failed'
+        except Exception as exc:  # pylint: disable=broad-except
+            LOGGER.exception('download failed: %s', url)
+            success, error = False, str(exc)
+        results[index] = DownloadResult(url, outfile, success, error)
+
+        for index_, outfile_, hexdigest_ in group[1:]:
+            if not success:
+                results[index_] = DownloadResult(url, outfile_, False, error)
+            elif not _same_digest(hexdigest, hexdigest_):
+                results[index_] = DownloadResult(url, outfile_, False, 'conflicting hexdigest for the same URL')
+            else:
+                LOGGER.debug('copying %s to %s', outfile, outfile_)
+                try:
+                    shutil.copyfile(str(outfile), str(outfile_))
+                    results[index_] = DownloadResult(url, outfile_, True, None)
+                except OSError as exc:
+                    results[index_] = DownloadResult(url, outfile_, False, str(exc))
+
+    progress.start(f'{len(groups)} files', None)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for future in [executor.submit(_download_group, url, group) for url, group in groups.items()]:
+                future.result()
+    finally:
+        progress.finish()
+
+    return typing.cast(typing.List[DownloadResult], results)
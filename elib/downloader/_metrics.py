@@ -0,0 +1,131 @@
+# coding=utf-8
+"""
+Timings and throughput of downloads
+"""
+import math
+import threading
+import time
+import typing
+
+# block throughputs are counted in a histogram with logarithmic buckets, HISTOGRAM_RESOLUTION per doubling,
+# so that percentiles are known within about 5% in constant memory, however many blocks are received
+HISTOGRAM_RESOLUTION = 8
+HISTOGRAM_SIZE = 48 * HISTOGRAM_RESOLUTION
+
+
+class DownloadMetrics:  # pylint: disable=too-many-instance-attributes
+    """
+    Telemetry of a single download
+
+    All durations are in seconds, measured from the start of the download; throughputs are in bytes per second.
+    Time to headers covers name resolution, connection, TLS handshake and server think time, as urllib3 does
+    not report them separately.
+    """
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.source = url
+        self.time_to_headers: typing.Optional[float] = None
+        self.time_to_first_byte: typing.Optional[float] = None
+        self.duration: typing.Optional[float] = None
+        self.bytes_received = 0
+        self.blocks = 0
+        self.retries = 0
+        self.failovers = 0
+        self.cached = False
+        self.not_modified = False
+        self.success: typing.Optional[bool] = None
+        self.block_sizes: typing.List[int] = []
+        self._rate_histogram = [0] * HISTOGRAM_SIZE
+        self._rate_count = 0
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _elapsed(self) -> float:
+        return time.monotonic() - self._start
+
+    def record_response(self, response):
+        """
+        Args:
+            response: urllib3 response, once its headers are received
+        """
+        with self._lock:
+            if self.time_to_headers is None:
+                self.time_to_headers = self._elapsed()
+            retries = getattr(response, 'retries', None)
+            if retries is not None:
+                self.retries += len(retries.history)
+
+    def record_block(self, size: int, elapsed: float, block_size: int):
+        """
+        Args:
+            size: number of bytes received
+            elapsed: time spent waiting for them
+            block_size: block size requested for the next read
+        """
+        with self._lock:
+            if self.time_to_first_byte is None:
+                self.time_to_first_byte = self._elapsed()
+            self.bytes_received += size
+            self.blocks += 1
+            if elapsed > 0 and size:
+                bucket = int(math.log2(max(size / elapsed, 1)) * HISTOGRAM_RESOLUTION)
+                self._rate_histogram[min(bucket, HISTOGRAM_SIZE - 1)] += 1
+                self._rate_count += 1
+            if not self.block_sizes or self.block_sizes[-1] != block_size:
+                self.block_sizes.append(block_size)
+
+    def finish(self, success: bool, source: str):
+        """
+        Args:
+            success: outcome of the download
+            source: URL the content was eventually received from
+        """
+        self.success = success
+        self.source = source
+        self.duration = self._elapsed()
+
+    @property
+    def average_throughput(self) -> typing.Optional[float]:
+        """
+        Returns: bytes received divided by the duration of the download
+        """
+        if not self.duration or not self.bytes_received:
+            return None
+        return self.bytes_received / self.duration
+
+    @property
+    def p95_block_throughput(self) -> typing.Optional[float]:
+        """
+        Returns: 95th percentile of the throughput of individual blocks, within about 5%
+        """
+        if not self._rate_count:
+            return None
+        rank = int(0.95 * (self._rate_count - 1))
+        for bucket, count in enumerate(self._rate_histogram):
+            rank -= count
+            if rank < 0:
+                return 2 ** ((bucket + 0.5) / HISTOGRAM_RESOLUTION)
+        return None  # pragma: no cover
+
+    def as_dict(self) -> dict:
+        """
+        Returns: the metrics, ready to be exported
+        """
+        return {
+            'url': self.url,
+            'source': self.source,
+            'success': self.success,
+            'cached': self.cached,
+            'not_modified': self.not_modified,
+            'time_to_headers': self.time_to_headers,
+            'time_to_first_byte': self.time_to_first_byte,
+            'duration': self.duration,
+            'bytes_received': self.bytes_received,
+            'blocks': self.blocks,
+            'retries': self.retries,
+            'failovers': self.failovers,
+            'average_throughput': self.average_throughput,
+            'p95_block_throughput': self.p95_block_throughput,
+            'block_sizes': list(self.block_sizes),
+        }
@@ -0,0 +1,157 @@
+# coding=utf-8
+"""
+Progress reporting for downloads
+
+Downloaders only count bytes and hand them to a reporter; formatting, throttling and display are left to the
+reporter itself.
+"""
+import threading
+import time
+import typing
+
+import tqdm
+
+
+def _calc_eta(start, now, total, current) -> str:
+
+    if total is None:
+        return '--:--'
+
+    dif = now - start
+    if current == 0 or dif < 0.001:
+        return '--:--'
+
+    rate = float(current) / dif
+    eta = int((float(total) - float(current)) / rate)
+    (eta_mins, eta_secs) = divmod(eta, 60)
+
+    if eta_mins > 99:
+        return '--:--'
+
+    return '%02d:%02d' % (eta_mins, eta_secs)
+
+
+def _calc_progress_percent(received, total) -> str:
+
+    if total is None:
+        return '-.-%'
+
+    percent = float(received) / total * 100
+    percent = '%.1f' % percent
+
+    return percent
+
+
+class ProgressReporter:
+    """
+    Receives progress from a download
+
+    The base class ignores everything.
+    """
+
+    def start(self, description: str, total: typing.Optional[int], initial: int = 0):
+        """
+        Called once when the transfer starts
+
+        Args:
+            description: what is being downloaded
+            total: expected number of bytes, if known
+            initial: number of bytes already received before this transfer
+
+        """
+
+    def update(self, amount: int):
+        """
+        Called for every block received
+
+        Args:
+            amount: number of bytes received since the last update
+
+        """
+
+    def finish(self):
+        """
+        Called once when the transfer ends
+        """
+
+
+class NullProgress(ProgressReporter):
+    """
+    Discards progress, for headless use
+    """
+
+
+class TqdmProgress(ProgressReporter):
+    """
+    Displays a tqdm progress bar
+    """
+
+    def __init__(self) -> None:
+        self.bar: typing.Optional[tqdm.tqdm] = None
+
+    def start(self, description: str, total: typing.Optional[int], initial: int = 0):
+        self.bar = tqdm.tqdm(total=total, initial=initial, unit_scale=True, unit='B',
+                             desc=f'Downloading {description}')
+
+    def update(self, amount: int):
+        self.bar.update(amount)
+
+    def finish(self):
+        self.bar.close()
+
+
+class CallbackProgress(ProgressReporter):
+    """
+    Sends status dictionaries to a callback, at most `max_rate` times per second
+
+    The status has the following keys: total, downloaded, status ("downloading" or "finished"),
+    percent_complete and time (estimated time left).
+    """
+
+    def __init__(self, callback: typing.Callable[[dict], None], max_rate: float = 10.0) -> None:
+        self.callback = callback
+        self.interval = 1.0 / max_rate if max_rate else 0.0
+        self.total: typing.Optional[int] = None
+        self.received = 0
+        self._start = 0.0
+        self._last_update = 0.0
+
+    def _emit(self, status: str, now: float):
+        self._last_update = now
+        self.callback({
+            'total': self.total,
+            'downloaded': self.received,
+            'status': status,
+            'percent_complete': _calc_progress_percent(self.received, self.total),
+            'time': _calc_eta(self._start, now, self.total, self.received) if status == 'downloading' else '00:00',
+        })
+
+    def start(self, description: str, total: typing.Optional[int], initial: int = 0):
+        self.total = total
+        self.received = initial
+        self._start = self._last_update = time.monotonic()
+
+    def update(self, amount: int):
+        self.received += amount
+        now = time.monotonic()
+        if now - self._last_update >= self.interval:
+            self._emit('downloading', now)
+
+    def finish(self):
+        self._emit('finished', time.monotonic())
+
+
+class SharedProgress(ProgressReporter):
+    """
+    Forwards the bytes of several concurrent transfers to a single reporter
+
+    The wrapped reporter must be started and finished by the owner of the batch.
+    """
+
+    def __init__(self, reporter: ProgressReporter) -> None:
+        self.reporter = reporter
+        self._lock = threading.Lock()
+
+    def update(self, amount: int):
+        with self._lock:
+            self.reporter.update(amount)
@@ -0,0 +1,99 @@
+# coding=utf-8
+"""
+Bandwidth throttling for downloads
+"""
+import logging
+import threading
+import time
+import typing
+
+LOGGER = logging.getLogger('elib')
+
+
+class RateLimiter:
+    """
+    Token bucket limiting the number of bytes per second
+
+    A single limiter can be shared by any number of concurrent downloads; they then share its bandwidth, each
+    waiting for its turn in the order the bytes were received.
+    """
+
+    def __init__(self, rate: float, burst: typing.Optional[int] = None) -> None:
+        """
+        Args:
+            rate: maximum sustained rate, in bytes per second
+            burst: maximum number of bytes that can be received at once (defaults to one second worth of data)
+        """
+        if rate <= 0:
+            raise ValueError(f'rate must be positive: {rate}')
+        self.rate = float(rate)
+        self.burst = int(burst or rate)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: int) -> float:
+        """
+        Takes `amount` bytes from the bucket, possibly going into debt
+
+        Args:
+            amount: number of bytes received
+
+        Returns: number of seconds to wait before receiving more data
+
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def consume(self, amount: int):
+        """
+        Takes `amount` bytes from the bucket, sleeping as long as needed to stay under the rate
+
+        Args:
+            amount: number of bytes received
+
+        """
+        delay = self.reserve(amount)
+        if delay > 0:
+            time.sleep(delay)
+
+
+_GLOBAL_LIMITER: typing.Optional[RateLimiter] = None
+
+
+def set_global_rate_limit(rate: typing.Optional[float], burst: typing.Optional[int] = None):
+    """
+    Limits the combined bandwidth of all downloads in the process
+
+    Args:
+        rate: maximum sustained rate, in bytes per second; None removes the limit
+        burst: maximum number of bytes that can be received at once (defaults to one second worth of data)
+
+    """
+    global _GLOBAL_LIMITER  # pylint: disable=global-statement
+    LOGGER.debug('global download rate limit: %s', rate)
+    _GLOBAL_LIMITER = RateLimiter(rate, burst) if rate else None
+
+
+def get_global_rate_limit() -> typing.Optional[RateLimiter]:
+    """
+    Returns: the limiter shared by all downloads in the process, if any
+    """
+    return _GLOBAL_LIMITER
+
+
+def active_limiters(rate_limit: typing.Optional[RateLimiter]) -> typing.List[RateLimiter]:
+    """
+    Args:
+        rate_limit: limiter specific to a download
+
+    Returns: all limiters that apply to that download
+
+    """
+    return [limiter for limiter in (rate_limit, _GLOBAL_LIMITER) if limiter is not None]
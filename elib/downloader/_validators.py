@@ -0,0 +1,99 @@
+# coding=utf-8
+"""
+Persists HTTP validators (ETag / Last-Modified) to revalidate previous downloads
+"""
+import json
+import logging
+import os
+import threading
+import typing
+from pathlib import Path
+
+LOGGER = logging.getLogger('elib')
+
+
+class ValidatorStore:
+    """
+    JSON file remembering, for each URL, the validators sent by the server along with the size and modification
+    time of the file they were downloaded to
+
+    Conditional headers are only produced while the local file is unchanged since it was downloaded.
+    """
+
+    def __init__(self, path: typing.Union[Path, str]) -> None:
+        self.path = Path(path).absolute()
+        self._lock = threading.Lock()
+        self._entries: typing.Dict[str, dict] = self._load()
+
+    def _load(self) -> typing.Dict[str, dict]:
+        if not self.path.exists():
+            return {}
+
+        try:
+            return json.loads(self.path.read_text(encoding='utf8'))
+        except (OSError, ValueError):
+            LOGGER.error('cannot read HTTP validators: %s', self.path)
+            return {}
+
+    def _save(self):
+        tmp_path = Path(f'{self.path}.tmp')
+        tmp_path.write_text(json.dumps(self._entries, indent=2, sort_keys=True), encoding='utf8')
+        os.replace(str(tmp_path), str(self.path))
+
+    @staticmethod
+    def _signature(filename: str) -> typing.Optional[typing.List[int]]:
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def headers_for(self, url: str, filename: str) -> typing.Dict[str, str]:
+        """
+        Args:
+            url: URL about to be downloaded
+            filename: local file the URL was previously downloaded to
+
+        Returns: conditional request headers, empty if the download cannot be revalidated
+
+        """
+        with self._lock:
+            entry = self._entries.get(url)
+
+        if not entry or entry.get('filename') != os.path.abspath(filename):
+            return {}
+
+        if entry.get('signature') != self._signature(filename):
+            LOGGER.debug('local file changed since last download: %s', filename)
+            return {}
+
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def update(self, url: str, filename: str, headers: typing.Mapping[str, str]):
+        """
+        Records the validators of a completed download
+
+        Args:
+            url: URL that was downloaded
+            filename: local file the content was written to
+            headers: headers of the response
+
+        """
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        with self._lock:
+            if not etag and not last_modified:
+                self._entries.pop(url, None)
+            else:
+                self._entries[url] = {
+                    'etag': etag,
+                    'last_modified': last_modified,
+                    'filename': os.path.abspath(filename),
+                    'signature': self._signature(filename),
+                }
+            self._save()
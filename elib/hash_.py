@@ -4,10 +4,85 @@ Computes hashes
 """
 
 import hashlib
+import json
 import logging
+import mmap
+import os
+import sqlite3
+import threading
+import time
+import typing
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
 LOGGER = logging.getLogger('elib')
 
+CHUNK_SIZE = 1024 * 1024
+BATCH_SIZE = 8 * 1024 * 1024
+BATCH_COUNT = 256
+RACY_WINDOW_NS = 2 * 10 ** 9
+BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def new_hash(method: str = 'md5'):
+    """
+    Creates an empty hash object that can be fed incrementally
+
+    Args:
+        method: hash method (defaults to MD5) One of [sha1, sha224, sha256, sha384, sha512, blake2b, blake2s]
+
+    Returns: hashlib hash object
+
+    """
+    try:
+        func = getattr(hashlib, method)
+    except AttributeError:
+        raise AttributeError('cannot find method "{}" in hashlib'.format(method))
+    else:
+        return func()
+
+
+def _to_bytes(data) -> bytes:
+    if isinstance(data, bytes):
+        return data
+    try:
+        return bytes(data, 'utf-8')
+    except ValueError:
+        raise ValueError(f'cannot cast {type(data)} to bytes implicitly')
+
+
+def _update_from_stream(hashes: typing.Iterable, fileobj, chunk_size: int = CHUNK_SIZE):
+    readinto = getattr(fileobj, 'readinto', None)
+    if readinto is None:
+        for chunk in iter(lambda: fileobj.read(chunk_size), b''):
+            for hash_ in hashes:
+                hash_.update(chunk)
+        return
+
+    buffer = memoryview(bytearray(chunk_size))
+    while True:
+        size = readinto(buffer)
+        if not size:
+            break
+        chunk = buffer[:size]
+        for hash_ in hashes:
+            hash_.update(chunk)
+
+
+def _update_from_file(hashes: typing.Iterable, path, use_mmap: bool = False, chunk_size: int = CHUNK_SIZE):
+    with open(path, 'rb', buffering=0) as file:
+        if use_mmap and os.fstat(file.fileno()).st_size:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for offset in range(0, len(view), chunk_size):
+                        for hash_ in hashes:
+                            hash_.update(view[offset:offset + chunk_size])
+                finally:
+                    view.release()
+        else:
+            _update_from_stream(hashes, file, chunk_size)
+
 
 def get_hash(data, method: str = 'md5') -> str:
     """
@@ -20,18 +95,548 @@ def get_hash(data, method: str = 'md5') -> str:
     Returns: hash value
 
     """
-    if not isinstance(data, bytes):
-        try:
-            data = bytes(data, 'utf-8')
-        except ValueError:
-            raise ValueError(f'cannot cast {type(data)} to bytes implicitly')
+    hash_ = new_hash(method)
+    hash_.update(_to_bytes(data))
+    hexdigest = hash_.hexdigest()
+    LOGGER.debug('hash for binary data: %s', hexdigest)
 
-    try:
-        func = getattr(hashlib, method)
-    except AttributeError:
-        raise AttributeError('cannot find method "{}" in hashlib'.format(method))
+    return hexdigest
+
+
+def get_hashes(data, methods: typing.Iterable[str] = ('md5', 'sha256')) -> typing.Dict[str, str]:
+    """
+    Computes several hashes of the same data in a single pass
+
+    Args:
+        data: bytes, str, path to a file (as a pathlib.Path) or binary file object; strings are hashed as
+            UTF-8 text, not opened as paths
+        methods: hash methods (defaults to MD5 and SHA256)
+
+    Returns: mapping of hash method to hash value
+
+    """
+    hashes = {method: new_hash(method) for method in methods}
+    if isinstance(data, os.PathLike):
+        _update_from_file(hashes.values(), data)
+    elif hasattr(data, 'read'):
+        _update_from_stream(hashes.values(), data)
     else:
-        hash_ = func(data).hexdigest()
-        LOGGER.debug('hash for binary data: %s', hash_)
+        data = _to_bytes(data)
+        for hash_ in hashes.values():
+            hash_.update(data)
+
+    hexdigests = {method: hash_.hexdigest() for method, hash_ in hashes.items()}
+    LOGGER.debug('hashes for binary data: %s', hexdigests)
+    return hexdigests
+
+
+def hash_stream(fileobj, method: str = 'md5', chunk_size: int = CHUNK_SIZE) -> str:
+    """
+    Computes hash from a binary file object, reading it chunk by chunk
+
+    Memory usage is bounded by the chunk size; file objects offering `readinto` are read into a single reused
+    buffer.
+
+    Args:
+        fileobj: binary file object, read until its end
+        method: hash method (defaults to MD5) One of [sha1, sha224, sha256, sha384, sha512, blake2b, blake2s]
+        chunk_size: number of bytes read at once
+
+    Returns: hash value
+
+    """
+    hash_ = new_hash(method)
+    _update_from_stream([hash_], fileobj, chunk_size)
+    hexdigest = hash_.hexdigest()
+    LOGGER.debug('hash for stream: %s', hexdigest)
+
+    return hexdigest
+
+
+def hash_file(
+        path: typing.Union[str, os.PathLike],
+        method: str = 'md5',
+        use_mmap: bool = False,
+        chunk_size: int = CHUNK_SIZE,
+) -> str:
+    """
+    Computes hash from the content of a file, without loading it in memory
+
+    Args:
+        path: path to the file
+        method: hash method (defaults to MD5) One of [sha1, sha224, sha256, sha384, sha512, blake2b, blake2s]
+        use_mmap: map the file in memory instead of reading it; the OS then pages it in as needed
+        chunk_size: number of bytes hashed at once
+
+    Returns: hash value
+
+    """
+    hash_ = new_hash(method)
+    _update_from_file([hash_], path, use_mmap, chunk_size)
+    hexdigest = hash_.hexdigest()
+    LOGGER.debug('hash for file %s: %s', path, hexdigest)
+
+    return hexdigest
+
+
+def _batch_by_size(sizes: typing.List[int]) -> typing.List[typing.List[int]]:
+    """
+    Groups small files together, so that each batch holds about BATCH_SIZE bytes, largest batches first
+    """
+    batches: typing.List[typing.List[int]] = []
+    batch: typing.List[int] = []
+    batch_size = 0
+    for index in sorted(range(len(sizes)), key=lambda index: sizes[index], reverse=True):
+        if sizes[index] >= BATCH_SIZE:
+            batches.append([index])
+            continue
+        batch.append(index)
+        batch_size += sizes[index]
+        if batch_size >= BATCH_SIZE or len(batch) >= BATCH_COUNT:
+            batches.append(batch)
+            batch, batch_size = [], 0
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def hash_files(
+        paths: typing.Iterable[typing.Union[str, os.PathLike]],
+        method: str = 'md5',
+        workers: typing.Optional[int] = None,
+        use_mmap: bool = False,
+) -> 'OrderedDict[typing.Union[str, os.PathLike], str]':
+    """
+    Computes hashes of many files concurrently
+
+    Large files are hashed on their own, while small ones are batched together to keep the overhead per task low.
+    Threads are enough to use several cores, as hashlib releases the GIL while hashing large chunks.
+
+    Args:
+        paths: paths to the files
+        method: hash method (defaults to MD5) One of [sha1, sha224, sha256, sha384, sha512, blake2b, blake2s]
+        workers: number of threads (defaults to the number of CPUs)
+        use_mmap: map the files in memory instead of reading them
+
+    Returns: mapping of path to hash value, in the order of `paths`
+
+    """
+    paths = list(paths)
+    new_hash(method)
+    sizes = [os.path.getsize(path) for path in paths]
+    batches = _batch_by_size(sizes)
+    workers = max(min(workers or os.cpu_count() or 1, len(batches)), 1)
+    LOGGER.debug('hashing %s files (%s bytes) in %s batches with %s threads',
+                  len(paths), sum(sizes), len(batches), workers)
+
+    def _hash_batch(batch: typing.List[int]) -> typing.List[str]:
+        return [hash_file(paths[index], method, use_mmap) for index in batch]
+
+    hexdigests: typing.List[typing.Optional[str]] = [None] * len(paths)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for batch, batch_hexdigests in zip(batches, executor.map(_hash_batch, batches)):
+            for index, hexdigest in zip(batch, batch_hexdigests):
+                hexdigests[index] = hexdigest
+
+    return OrderedDict(zip(paths, hexdigests))
+
+
+def _signature(path) -> typing.Tuple[int, int, int]:
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+class HashCache:
+    """
+    Persistent cache of file hashes, backed by SQLite
+
+    Hashes are stored per absolute path and method, along with the size, modification time (in ns) and inode of
+    the file; they are only reused while all three are unchanged. Files modified less than two seconds before
+    they were hashed are not cached, as a later change within the resolution of the filesystem clock would go
+    unnoticed.
+    """
+
+    def __init__(self, path: typing.Union[str, os.PathLike]) -> None:
+        """
+        Args:
+            path: SQLite database file, created if needed
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS hashes ('
+                'path TEXT NOT NULL, method TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, '
+                'inode INTEGER NOT NULL, hexdigest TEXT NOT NULL, PRIMARY KEY (path, method))'
+            )
+
+    def close(self):
+        """
+        Closes the database
+        """
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def get(self, path: typing.Union[str, os.PathLike], method: str = 'md5') -> typing.Optional[str]:
+        """
+        Args:
+            path: path to the file
+            method: hash method
+
+        Returns: cached hash value, or None if the file changed since it was hashed
+
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT size, mtime_ns, inode, hexdigest FROM hashes WHERE path = ? AND method = ?', (path, method)
+            ).fetchone()
+        if row is None or tuple(row[:3]) != _signature(path):
+            return None
+        return row[3]
+
+    def put(self, path: typing.Union[str, os.PathLike], method: str, hexdigest: str,
+            signature: typing.Tuple[int, int, int]):
+        """
+        Args:
+            path: path to the file
+            method: hash method
+            hexdigest: hash value
+            signature: size, modification time and inode of the file when it was hashed
+        """
+        if int(time.time() * 10 ** 9) - signature[1] < RACY_WINDOW_NS:
+            LOGGER.debug('not caching hash of recently modified file: %s', path)
+            return
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?)',
+                (os.path.abspath(path), method, *signature, hexdigest),
+            )
+
+    def _store_if_unchanged(self, path, method: str, hexdigest: str, signature: typing.Tuple[int, int, int]):
+        if _signature(path) == signature:
+            self.put(path, method, hexdigest, signature)
+        else:
+            LOGGER.debug('file changed while being hashed: %s', path)
+
+    def hash_file(self, path: typing.Union[str, os.PathLike], method: str = 'md5', use_mmap: bool = False) -> str:
+        """
+        Computes hash from the content of a file, unless the cache already knows it
+
+        Args:
+            path: path to the file
+            method: hash method (defaults to MD5) One of [sha1, sha224, sha256, sha384, sha512, blake2b, blake2s]
+            use_mmap: map the file in memory instead of reading it
+
+        Returns: hash value
+
+        """
+        hexdigest = self.get(path, method)
+        if hexdigest is not None:
+            LOGGER.debug('cached hash for file %s: %s', path, hexdigest)
+            return hexdigest
+
+        signature = _signature(path)
+        hexdigest = hash_file(path, method, use_mmap)
+        self._store_if_unchanged(path, method, hexdigest, signature)
+        return hexdigest
+
+    def hash_files(
+            self,
+            paths: typing.Iterable[typing.Union[str, os.PathLike]],
+            method: str = 'md5',
+            workers: typing.Optional[int] = None,
+            use_mmap: bool = False,
+    ) -> 'OrderedDict[typing.Union[str, os.PathLike], str]':
+        """
+        Computes hashes of many files concurrently, only hashing the files the cache does not know
+
+        Args:
+            paths: paths to the files
+            method: hash method (defaults to MD5) One of [sha1, sha224, sha256, sha384, sha512, blake2b, blake2s]
+            workers: number of threads (defaults to the number of CPUs)
+            use_mmap: map the files in memory instead of reading them
+
+        Returns: mapping of path to hash value, in the order of `paths`
+
+        """
+        paths = list(paths)
+        hexdigests = OrderedDict((path, self.get(path, method)) for path in paths)
+        missing = [path for path, hexdigest in hexdigests.items() if hexdigest is None]
+        LOGGER.debug('%s hashes cached, %s to compute', len(hexdigests) - len(missing), len(missing))
+        if missing:
+            signatures = {path: _signature(path) for path in missing}
+            for path, hexdigest in hash_files(missing, method, workers, use_mmap).items():
+                hexdigests[path] = hexdigest
+                self._store_if_unchanged(path, method, hexdigest, signatures[path])
+        return hexdigests
+
+    def evict(self) -> int:
+        """
+        Removes the entries of files that do not exist anymore
+
+        Returns: number of files removed from the cache
+
+        """
+        with self._lock:
+            paths = [row[0] for row in self._connection.execute('SELECT DISTINCT path FROM hashes')]
+            deleted = [(path,) for path in paths if not os.path.exists(path)]
+            with self._connection:
+                self._connection.executemany('DELETE FROM hashes WHERE path = ?', deleted)
+        LOGGER.debug('evicted %s deleted files from the hash cache', len(deleted))
+        return len(deleted)
+
+
+ManifestEntry = namedtuple('ManifestEntry', 'size hexdigest')
+ManifestDiff = namedtuple('ManifestDiff', 'added removed changed')
+
+
+class TreeManifest:
+    """
+    Sizes and hashes of all the files of a directory tree, with Merkle digests of every directory
+
+    Paths are relative to the root of the tree and use forward slashes, so that manifests built on different
+    systems compare equal. The digest of a directory covers the names, sizes and hashes of everything below it;
+    comparing two manifests only looks into the directories whose digests differ.
+    """
+
+    def __init__(self, method: str, entries: typing.Mapping[str, ManifestEntry]) -> None:
+        """
+        Args:
+            method: hash method the files were hashed with
+            entries: mapping of relative path to ManifestEntry
+        """
+        self.method = method
+        self.entries = OrderedDict((path, ManifestEntry(*entries[path])) for path in sorted(entries))
+        self._directory_digests: typing.Optional[typing.Dict[str, str]] = None
+
+    def __eq__(self, other):
+        return isinstance(other, TreeManifest) and self.method == other.method and self.entries == other.entries
+
+    def __repr__(self):
+        return f'TreeManifest({len(self.entries)} files, {self.method}:{self.root_digest})'
+
+    @property
+    def directory_digests(self) -> typing.Dict[str, str]:
+        """
+        Returns: mapping of relative directory path ('' for the root) to Merkle digest
+        """
+        if self._directory_digests is None:
+            children: typing.Dict[str, typing.List[str]] = {'': []}
+            for path, entry in self.entries.items():
+                parent, _, name = path.rpartition('/')
+                directory = parent
+                while directory not in children:
+                    children[directory] = []
+                    directory = directory.rpartition('/')[0]
+                children[parent].append(f'F {name} {entry.size} {entry.hexdigest}\n')
+
+            digests: typing.Dict[str, str] = {}
+            for directory in sorted(children, key=lambda directory: directory.count('/') if directory else -1,
+                                    reverse=True):
+                hash_ = new_hash(self.method)
+                for line in sorted(children[directory]):
+                    hash_.update(line.encode('utf-8'))
+                digests[directory] = hash_.hexdigest()
+                if directory:
+                    parent, _, name = directory.rpartition('/')
+                    children[parent].append(f'D {name} {digests[directory]}\n')
+            self._directory_digests = digests
+        return self._directory_digests
+
+    @property
+    def root_digest(self) -> str:
+        """
+        Returns: Merkle digest of the whole tree
+        """
+        return self.directory_digests['']
+
+    def diff(self, other: 'TreeManifest') -> ManifestDiff:
+        """
+        Lists the files that differ from another manifest
+
+        Args:
+            other: manifest of the previous state of the tree
+
+        Returns: sorted lists of the paths added, removed and changed since `other`
+
+        """
+        if self.method != other.method:
+            raise ValueError(f'cannot compare manifests hashed with {self.method} and {other.method}')
+
+        mine, theirs = self.directory_digests, other.directory_digests
+        dirty = {directory for directory in set(mine) | set(theirs) if mine.get(directory) != theirs.get(directory)}
+
+        def _candidates(manifest: TreeManifest) -> typing.Set[str]:
+            return {path for path in manifest.entries if path.rpartition('/')[0] in dirty}
+
+        new, old = _candidates(self), _candidates(other)
+        return ManifestDiff(
+            added=sorted(new - old),
+            removed=sorted(old - new),
+            changed=sorted(path for path in new & old if self.entries[path] != other.entries[path]),
+        )
+
+    def to_json(self) -> str:
+        """
+        Returns: deterministic JSON representation of the manifest
+        """
+        return json.dumps({
+            'method': self.method,
+            'root': self.root_digest,
+            'files': [[path, entry.size, entry.hexdigest] for path, entry in self.entries.items()],
+        }, indent=1)
+
+    @classmethod
+    def from_json(cls, text: str) -> 'TreeManifest':
+        """
+        Args:
+            text: JSON representation of a manifest, as produced by `to_json`
+
+        Returns: manifest
+
+        """
+        data = json.loads(text)
+        entries = {path: ManifestEntry(size, hexdigest) for path, size, hexdigest in data['files']}
+        manifest = cls(data['method'], entries)
+        if manifest.root_digest != data['root']:
+            raise ValueError('manifest does not match its root digest')
+        return manifest
+
+
+def _walk_files(root: str) -> typing.Iterator[typing.Tuple[str, str]]:
+    stack = ['']
+    while stack:
+        relative = stack.pop()
+        with os.scandir(os.path.join(root, relative)) as entries:
+            for entry in entries:
+                path = f'{relative}/{entry.name}' if relative else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(path)
+                elif entry.is_file():
+                    yield path, entry.path
+
+
+def hash_tree(
+        root: typing.Union[str, os.PathLike],
+        method: str = 'md5',
+        workers: typing.Optional[int] = None,
+        cache: typing.Optional['HashCache'] = None,
+) -> TreeManifest:
+    """
+    Builds the manifest of a directory tree, hashing its files concurrently
+
+    Symbolic links to files are hashed as the file they point to; symbolic links to directories are not followed.
+
+    Args:
+        root: directory to walk
+        method: hash method (defaults to MD5) One of [sha1, sha224, sha256, sha384, sha512, blake2b, blake2s]
+        workers: number of threads (defaults to the number of CPUs)
+        cache: HashCache to reuse the hashes of unchanged files from
+
+    Returns: manifest of the tree
+
+    """
+    files = OrderedDict(_walk_files(os.fspath(root)))
+    LOGGER.debug('hashing %s files under %s', len(files), root)
+    hexdigests = (cache.hash_files if cache is not None else hash_files)(list(files.values()), method, workers)
+    manifest = TreeManifest(method, {
+        relative: ManifestEntry(os.path.getsize(path), hexdigests[path]) for relative, path in files.items()
+    })
+    LOGGER.debug('root digest for %s: %s', root, manifest.root_digest)
+    return manifest
+
+
+BlockDigests = namedtuple('BlockDigests', 'method block_size size hexdigest blocks')
+
+
+def hash_file_blocks(
+        path: typing.Union[str, os.PathLike],
+        method: str = 'md5',
+        block_size: int = BLOCK_SIZE,
+) -> BlockDigests:
+    """
+    Computes the hash of a file along with the hashes of each of its fixed-size blocks, in a single pass
+
+    Args:
+        path: path to the file
+        method: hash method (defaults to MD5) One of [sha1, sha224, sha256, sha384, sha512, blake2b, blake2s]
+        block_size: size of the blocks; the last one may be shorter
+
+    Returns: BlockDigests with the method, block size, file size, hash of the whole file and list of block hashes
+
+    """
+    whole = new_hash(method)
+    blocks = []
+    size = 0
+    buffer = memoryview(bytearray(block_size))
+    with open(path, 'rb', buffering=0) as file:
+        while True:
+            received = 0
+            while received < block_size:
+                read = file.readinto(buffer[received:])
+                if not read:
+                    break
+                received += read
+            if not received:
+                break
+            block = buffer[:received]
+            whole.update(block)
+            block_hash = new_hash(method)
+            block_hash.update(block)
+            blocks.append(block_hash.hexdigest())
+            size += received
+
+    LOGGER.debug('%s block hashes for file %s', len(blocks), path)
+    return BlockDigests(method, block_size, size, whole.hexdigest(), blocks)
+
+
+def _hash_range(path, method: str, offset: int, size: int) -> str:
+    hash_ = new_hash(method)
+    with open(path, 'rb', buffering=0) as file:
+        file.seek(offset)
+        buffer = memoryview(bytearray(max(min(CHUNK_SIZE, size), 1)))
+        while size:
+            read = file.readinto(buffer[:min(len(buffer), size)])
+            if not read:
+                break
+            hash_.update(buffer[:read])
+            size -= read
+    return hash_.hexdigest()
+
+
+def verify_blocks(
+        path: typing.Union[str, os.PathLike],
+        digests: BlockDigests,
+        workers: typing.Optional[int] = None,
+) -> typing.List[int]:
+    """
+    Checks the blocks of a file against their expected hashes, several blocks at a time
+
+    Args:
+        path: path to the file
+        digests: expected hashes, as returned by hash_file_blocks
+        workers: number of threads (defaults to the number of CPUs)
+
+    Returns: indices of the blocks that do not match; a file that is too short fails its missing blocks, while
+        bytes past the expected size are not checked
+
+    """
+    def _check(index: int) -> bool:
+        offset = index * digests.block_size
+        size = min(digests.block_size, digests.size - offset)
+        return _hash_range(path, digests.method, offset, size) == digests.blocks[index]
+
+    indices = range(len(digests.blocks))
+    with ThreadPoolExecutor(max_workers=max(min(workers or os.cpu_count() or 1, len(indices)), 1)) as executor:
+        mismatched = [index for index, valid in zip(indices, executor.map(_check, indices)) if not valid]
 
-        return hash_
+    if mismatched:
+        LOGGER.debug('%s blocks out of %s do not match in %s', len(mismatched), len(indices), path)
+    return mismatched
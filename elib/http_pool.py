@@ -0,0 +1,154 @@
+# coding=utf-8
+"""
+Process-wide HTTP connection pool
+
+All HTTP traffic in elib goes through a single urllib3 PoolManager, so connections (and their TLS sessions) are
+kept alive and reused across downloads, API calls and pastes. The same pool backs the requests Session returned
+by `get_session`.
+"""
+import logging
+import threading
+import typing
+
+import certifi
+import requests
+import requests.adapters
+import urllib3  # type: ignore
+
+LOGGER = logging.getLogger('elib')
+
+_LOCK = threading.RLock()
+_SETTINGS: typing.Dict[str, typing.Any] = {
+    'num_pools': 10,
+    'maxsize': 10,
+    'connect_timeout': 10.0,
+    'read_timeout': 30.0,
+    'keep_alive': True,
+}
+_POOL: typing.Optional[urllib3.PoolManager] = None
+_SESSION: typing.Optional[requests.Session] = None
+
+
+class _SharedPoolAdapter(requests.adapters.HTTPAdapter):
+    """
+    Transport adapter that sends requests through the process-wide pool instead of its own
+    """
+
+    def init_poolmanager(self, *args, **kwargs):  # pylint: disable=unused-argument
+        pass
+
+    @property  # type: ignore
+    def poolmanager(self) -> urllib3.PoolManager:
+        """
+        The process-wide pool, looked up on every use since it is re-created when it has to grow
+        """
+        return get_http_pool()
+
+    @poolmanager.setter
+    def poolmanager(self, _):
+        pass
+
+    def send(self, request, timeout=None, **kwargs):  # pylint: disable=arguments-differ
+        if timeout is None:
+            timeout = (_SETTINGS['connect_timeout'], _SETTINGS['read_timeout'])
+        request.headers.update(connection_headers({}))
+        return super(_SharedPoolAdapter, self).send(request, timeout=timeout, **kwargs)
+
+
+def configure_http_pool(
+        num_pools: int = 10,
+        maxsize: int = 10,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 30.0,
+        keep_alive: bool = True,
+):
+    """
+    Configures the process-wide connection pool
+
+    The current pool, if any, is closed; it will be re-created with the new settings on next use.
+
+    Args:
+        num_pools: number of hosts to keep connection pools for
+        maxsize: maximum number of connections kept open per host; raised on demand when a download needs more
+            concurrent connections
+        connect_timeout: timeout in seconds to establish a connection
+        read_timeout: timeout in seconds between two reads on an established connection
+        keep_alive: keep connections open between requests
+
+    """
+    global _POOL, _SESSION  # pylint: disable=global-statement
+    with _LOCK:
+        _SETTINGS.update(
+            num_pools=num_pools,
+            maxsize=maxsize,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            keep_alive=keep_alive,
+        )
+        LOGGER.debug('HTTP pool settings: %s', _SETTINGS)
+        if _POOL is not None:
+            _POOL.clear()
+        _POOL = None
+        _SESSION = None
+
+
+def connection_headers(headers: typing.Optional[dict] = None) -> typing.Optional[dict]:
+    """
+    Adds the headers needed by the pool settings to the headers of a request
+
+    Headers given to the PoolManager itself are ignored as soon as a request has headers of its own, so they
+    have to be set on every request instead.
+
+    Args:
+        headers: headers of the request
+
+    Returns: headers to send
+
+    """
+    if _SETTINGS['keep_alive']:
+        return headers
+    return dict(headers or {}, Connection='close')
+
+
+def get_http_pool(maxsize: int = 1) -> urllib3.PoolManager:
+    """
+    Args:
+        maxsize: number of concurrent connections per host the caller needs; if the pool keeps fewer, it is
+            re-created larger, and the idle connections of the previous one are closed. Requests already in flight
+            complete on their connection, which is then closed. The configured size is left as it is, and is
+            used again once the pool is reconfigured.
+
+    Returns: the process-wide urllib3 pool manager
+    """
+    global _POOL  # pylint: disable=global-statement
+    with _LOCK:
+        maxsize = max(maxsize, _SETTINGS['maxsize'])
+        if _POOL is not None and maxsize > _POOL.connection_pool_kw['maxsize']:
+            LOGGER.debug('growing HTTP pool to %s connections per host', maxsize)
+            _POOL.clear()
+            _POOL = None
+        if _POOL is None:
+            LOGGER.debug('creating HTTP pool')
+            _POOL = urllib3.PoolManager(
+                num_pools=_SETTINGS['num_pools'],
+                maxsize=maxsize,
+                timeout=urllib3.Timeout(connect=_SETTINGS['connect_timeout'], read=_SETTINGS['read_timeout']),
+                cert_reqs=str('CERT_REQUIRED'),
+                ca_certs=certifi.where(),
+            )
+        return _POOL
+
+
+def get_session() -> requests.Session:
+    """
+    Returns: the process-wide requests Session, backed by the shared pool
+    """
+    global _SESSION  # pylint: disable=global-statement
+    with _LOCK:
+        if _SESSION is None:
+            session = requests.Session()
+            adapter = _SharedPoolAdapter()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _SESSION = session
+        return _SESSION
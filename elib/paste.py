@@ -9,6 +9,8 @@ from collections import namedtuple
 
 import requests
 
+from elib.http_pool import get_session
+
 BASE_URL = 'https://snippets.glot.io/snippets'
 
 PasteContent = namedtuple('PasteContent', 'filename content')
@@ -43,7 +45,7 @@ def create_new_paste(title, files: typing.List[PasteContent], public: bool = Fal
             } for file in files
         ],
     }
-    req = requests.post(BASE_URL, json=data, headers=headers)
+    req = get_session().post(BASE_URL, json=data, headers=headers)
     if req.ok:
         resp = json.loads(req.text)
         url = resp['url'].replace('https://snippets.glot.io', 'https://glot.io')
@@ -3,8 +3,12 @@
 Manages runners
 """
 
+import collections
 import os
+import queue
+import subprocess
 import sys
+import threading
 import typing
 from pathlib import Path
 
@@ -119,6 +123,64 @@ def _parse_output(process, filters):
     return '\n'.join(result)
 
 
+def _read_pipe(pipe, name: str, lines: queue.Queue):
+    try:
+        for line in iter(pipe.readline, ''):
+            lines.put((name, line))
+    finally:
+        pipe.close()
+        lines.put((name, None))
+
+
+def _stream_output(process, filters, mute: bool, tail: typing.Optional[int]) -> str:
+    result: typing.Deque[str] = collections.deque(maxlen=tail)
+    lines: queue.Queue = queue.Queue()
+    readers = [
+        threading.Thread(target=_read_pipe, args=(pipe, name, lines), daemon=True)
+        for name, pipe in (('out', process.stdout), ('err', process.stderr))
+    ]
+    for reader in readers:
+        reader.start()
+
+    open_pipes = len(readers)
+    while open_pipes:
+        name, line = lines.get()
+        if line is None:
+            open_pipes -= 1
+            continue
+        line = filter_line(line.rstrip('\r\n'), filters)
+        if not line:
+            continue
+        result.append(line)
+        if not mute:
+            if name == 'out':
+                std_out(line)
+            else:
+                std_err(line)
+
+    for reader in readers:
+        reader.join()
+    return '\n'.join(result)
+
+
+def _process_stream_result(return_code, mute, exe_short, failure_ok, result) -> typing.Tuple[str, int]:
+    if return_code:
+        if mute:
+            cmd_end('')
+        error(f'command failed: {exe_short} -> {return_code}')
+        if mute and result:
+            # output was not echoed as it arrived
+            std_err(f'{exe_short} error:\n{result}')
+        if not failure_ok:
+            exit(return_code)
+    elif mute:
+        cmd_end(f' -> {return_code}')
+    else:
+        info(f'{exe_short} -> {return_code}')
+
+    return result, return_code
+
+
 def _process_run_error(
         mute,
         result,
@@ -194,6 +256,8 @@ def _prepare_run_advertise(mute, cmd):
     else:
         info(f'RUNNING: {cmd}')
 
+    return mute
+
 
 def run(
         cmd: str,
@@ -202,6 +266,8 @@ def run(
         mute: bool = False,
         filters: typing.Union[None, typing.Iterable[str]] = None,
         failure_ok: bool = False,
+        stream: bool = False,
+        tail: typing.Optional[int] = None,
 ) -> typing.Tuple[str, int]:
     """
     Executes a command and returns the result
@@ -213,6 +279,9 @@ def run(
         mute: if true, output will not be printed
         filters: gives a list of partial strings to filter out from the output (stdout or stderr)
         failure_ok: if False (default), a return code different than 0 will exit the application
+        stream: if True, output is read and printed line by line while the command runs, instead of all at once
+            when it exits
+        tail: when streaming, only keep that many lines of output for the result (defaults to keeping them all)
 
     Returns: command output
     """
@@ -224,6 +293,15 @@ def run(
 
     cmd = ' '.join([f'"{exe.absolute()}"'] + cmd.split(' ')[1:])
 
+    if stream:
+        mute = _prepare_run_advertise(mute, cmd)
+        process = subprocess.Popen(
+            cmd, shell=True, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True, errors='replace', bufsize=1,
+        )
+        result = _stream_output(process, filters, mute, tail)
+        return _process_stream_result(process.wait(), mute, exe_short, failure_ok, result)
+
     _prepare_run_advertise(mute, cmd)
 
     process = delegator.run(cmd, block=True, cwd=cwd, binary=False)
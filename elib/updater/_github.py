@@ -6,12 +6,12 @@ import logging
 import typing
 from pathlib import Path
 
-import requests
 import requests.exceptions
 from humanize import naturalsize
 
 from ..custom_random import random_string
 from ..downloader import Downloader, download
+from ..http_pool import get_session
 
 LOGGER = logging.getLogger('elib')
 
@@ -98,7 +98,7 @@ def get_latest_release(repo: str) -> typing.Optional[Release]:
     """
     LOGGER.debug('obtaining latest version for "%s"', repo)
     try:
-        req = requests.get(rf'https://api.github.com/repos/{repo}/releases/latest', timeout=5)
+        req = get_session().get(rf'https://api.github.com/repos/{repo}/releases/latest', timeout=5)
     except requests.exceptions.Timeout:
         LOGGER.exception('request timed out')
         return None
@@ -0,0 +1,138 @@
+# coding=utf-8
+"""
+Local HTTP server serving a random payload, with optional support for byte ranges and chunked encoding
+"""
+import gzip
+import http.server
+import os
+import socketserver
+import threading
+import time
+
+import pytest
+
+PAYLOAD = os.urandom(1024 * 1024 + 7)
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    payload = PAYLOAD
+    accept_ranges = True
+    etag = '"payload"'
+    fail_after = None
+    chunked = False
+    corrupt_at = None
+    content_encoding = None
+    honor_accept_encoding = True
+
+    def _encode(self, body: bytes) -> bytes:
+        if self.content_encoding is None:
+            return body
+        if self.honor_accept_encoding and self.headers.get('Accept-Encoding', '').lower() == 'identity':
+            return body
+        self.send_header('Content-Encoding', self.content_encoding)
+        return gzip.compress(body)
+
+    def _send_special(self):
+        if self.path.startswith('/redirect'):
+            self.send_response(302)
+            self.send_header('Location', '/payload')
+        elif self.path.startswith('/missing'):
+            self.send_response(404)
+        else:
+            return False
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+        return True
+
+    def _send_chunked(self):
+        self.send_response(200)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for index in range(0, len(self.payload), 100000):
+            chunk = self.payload[index:index + 100000]
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _send_headers(self):
+        if self.headers.get('If-None-Match') == self.etag:
+            self.send_response(304)
+            self.send_header('ETag', self.etag)
+            self.end_headers()
+            return b''
+        range_ = self.headers.get('Range')
+        if_range = self.headers.get('If-Range')
+        if range_ and self.accept_ranges and if_range in (None, self.etag):
+            start, end = range_.replace('bytes=', '').split('-')
+            start, end = int(start), int(end or len(self.payload) - 1)
+            if start >= len(self.payload):
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(self.payload)}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return b''
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(self.payload)}')
+            body = self.payload[start:end + 1]
+        else:
+            self.send_response(200)
+            body = self.payload
+            if self.corrupt_at is not None:
+                body = body[:self.corrupt_at] + bytes([body[self.corrupt_at] ^ 0xFF]) + body[self.corrupt_at + 1:]
+        body = self._encode(body)
+        if self.accept_ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', self.etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        return body
+
+    def do_HEAD(self):  # noqa: N802
+        self._send_headers()
+
+    def do_GET(self):  # noqa: N802
+        if self._send_special():
+            return
+        if self.chunked:
+            self._send_chunked()
+            return
+        if self.path.startswith('/slow'):
+            time.sleep(0.5)
+        body = self._send_headers()
+        if self.path.startswith('/stall'):
+            self.wfile.write(body[:300000])
+            self.wfile.flush()
+            time.sleep(2)
+            self.close_connection = True
+            return
+        fail_after = 300000 if self.path.startswith('/broken') else self.fail_after
+        if fail_after is not None:
+            body = body[:fail_after]
+            self.close_connection = True
+        self.wfile.write(body)
+
+    def log_message(self, *_):
+        pass
+
+
+class _Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture(name='payload')
+def _payload():
+    return PAYLOAD
+
+
+@pytest.fixture(name='http_handler')
+def _http_handler():
+    return _Handler
+
+
+@pytest.fixture(name='local_url')
+def _local_url():
+    server = _Server(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/payload'
+    server.shutdown()
+    server.server_close()
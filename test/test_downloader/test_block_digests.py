@@ -0,0 +1,106 @@
+# coding=utf-8
+from pathlib import Path
+
+import pytest
+
+import elib.hash_
+from elib import downloader
+from elib.downloader import _downloader
+
+BLOCK_SIZE = 64 * 1024
+
+
+@pytest.fixture(name='digests')
+def _digests(payload):
+    Path('expected').write_bytes(payload)
+    return elib.hash_.hash_file_blocks('expected', 'sha256', BLOCK_SIZE)
+
+
+def test_merge_blocks():
+    assert downloader.Downloader._merge_blocks([0, 1, 3, 5, 6, 7], 10, 75) == [(0, 19), (30, 39), (50, 74)]
+
+
+@pytest.mark.parametrize('segments', [1, 4])
+def test_download_corrupt_transfer(local_url, payload, http_handler, monkeypatch, digests, segments):
+    monkeypatch.setattr(http_handler, 'corrupt_at', BLOCK_SIZE * 3 + 5)
+    downloader_ = downloader.Downloader(local_url, 'test', block_digests=digests, segments=segments)
+    assert downloader_.hexdigest == digests.hexdigest
+    assert downloader_.download()
+    assert Path('test').read_bytes() == payload
+
+
+def test_clean_download_not_verified_per_block(local_url, payload, monkeypatch, digests):
+    calls = []
+    monkeypatch.setattr(_downloader, 'verify_blocks', lambda *args: calls.append(args) or [])
+    assert downloader.Downloader(local_url, 'test', block_digests=digests).download()
+    assert Path('test').read_bytes() == payload
+    assert not calls
+
+
+def test_download_corrupt_transfer_no_ranges(local_url, http_handler, monkeypatch, digests):
+    monkeypatch.setattr(http_handler, 'corrupt_at', 10)
+    monkeypatch.setattr(http_handler, 'accept_ranges', False)
+    assert not downloader.download(local_url, 'test', block_digests=digests)
+    assert not Path('test').exists()
+    assert not Path('test.part').exists()
+
+
+def test_repair_existing_file(local_url, payload, digests):
+    corrupt = bytearray(payload)
+    corrupt[BLOCK_SIZE * 2] ^= 0xFF
+    corrupt[-1] ^= 0xFF
+    Path('test').write_bytes(corrupt)
+    downloader_ = downloader.Downloader(local_url, 'test', block_digests=digests)
+    assert downloader_.download()
+    assert Path('test').read_bytes() == payload
+    assert downloader_.metrics.bytes_received == BLOCK_SIZE + len(payload) % BLOCK_SIZE
+
+
+def test_existing_file_intact(local_url, payload, digests):
+    Path('test').write_bytes(payload)
+    downloader_ = downloader.Downloader(local_url, 'test', block_digests=digests)
+    assert downloader_.download()
+    assert downloader_.metrics.bytes_received == 0
+    assert Path('test').read_bytes() == payload
+
+
+def test_existing_file_intact_checked_in_place(payload, monkeypatch, digests):
+    Path('test').write_bytes(payload)
+    calls = []
+    monkeypatch.setattr(_downloader, 'verify_blocks', lambda path, *_: calls.append(path) or [])
+    monkeypatch.setattr(_downloader.shutil, 'copyfile', lambda *args: calls.append(args))
+    assert downloader.Downloader('http://127.0.0.1:1/payload', 'test', block_digests=digests).download()
+    assert calls == ['test']
+    assert not Path('test.part').exists()
+
+
+def test_existing_file_wrong_size(local_url, payload, digests):
+    Path('test').write_bytes(payload[:-1])
+    downloader_ = downloader.Downloader(local_url, 'test', block_digests=digests)
+    assert downloader_.download()
+    assert downloader_.metrics.bytes_received == len(payload)
+    assert Path('test').read_bytes() == payload
+
+
+def test_existing_file_cannot_repair(local_url, payload, http_handler, monkeypatch, digests):
+    monkeypatch.setattr(http_handler, 'accept_ranges', False)
+    corrupt = bytearray(payload)
+    corrupt[0] ^= 0xFF
+    Path('test').write_bytes(corrupt)
+    assert downloader.download(local_url, 'test', block_digests=digests)
+    assert Path('test').read_bytes() == payload
+
+
+def test_corrupt_existing_file_removed_on_failure(local_url, payload, digests):
+    corrupt = bytearray(payload)
+    corrupt[0] ^= 0xFF
+    Path('test').write_bytes(corrupt)
+    url = local_url.replace('/payload', '/missing')
+    assert not downloader.Downloader(url, 'test', block_digests=digests).download()
+    assert not Path('test').exists()
+    assert not Path('test.part').exists()
+
+
+def test_block_digests_with_decompress(digests):
+    with pytest.raises(ValueError):
+        downloader.Downloader('http://127.0.0.1:1/payload', 'test', block_digests=digests, decompress='gzip')
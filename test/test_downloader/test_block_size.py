@@ -0,0 +1,61 @@
+# coding=utf-8
+import pytest
+
+from elib import downloader
+from elib.downloader._block_size import BlockSizeController
+
+
+def test_grows_on_fast_link():
+    controller = BlockSizeController()
+    block_size = 16384
+    for _ in range(20):
+        block_size = controller.update(block_size, 0.0001, block_size)
+    assert block_size == controller.maximum
+
+
+def test_shrinks_on_slow_link():
+    controller = BlockSizeController(target_read_time=0.1)
+    block_size = 1024 * 1024
+    for _ in range(20):
+        block_size = controller.update(block_size, block_size / 100000, block_size)
+    assert block_size == 8192
+
+
+def test_steps_are_bounded():
+    controller = BlockSizeController()
+    assert controller.update(16384, 0.00001, 16384) == 32768
+    controller = BlockSizeController()
+    assert controller.update(16384, 10, 16384) == 8192
+
+
+def test_single_outlier_is_smoothed():
+    controller = BlockSizeController(target_read_time=0.1, smoothing=0.2)
+    block_size = 100000
+    for _ in range(20):
+        block_size = controller.update(block_size, 0.1, block_size)
+    assert block_size == 98304
+    block_size = controller.update(block_size, 1, block_size)
+    assert block_size > 65536
+
+
+def test_no_sample():
+    controller = BlockSizeController()
+    assert controller.update(16384, 0, 16384) == 32768
+    assert controller.rate is None
+
+
+def test_bounds():
+    assert BlockSizeController(4096, 8192).update(8192, 0.00001, 8192) == 8192
+    assert BlockSizeController(65536, 131072).update(1, 1, 65536) == 65536
+
+
+@pytest.mark.parametrize('kwargs', [{'minimum': 0}, {'minimum': 10, 'maximum': 5}, {'smoothing': 0}])
+def test_invalid(kwargs):
+    with pytest.raises(ValueError):
+        BlockSizeController(**kwargs)
+
+
+def test_download_bounds(local_url, payload):
+    downloader_ = downloader.Downloader(local_url, 'test', stream=True, min_block_size=4096, max_block_size=65536)
+    assert downloader_.download()
+    assert max(downloader_.metrics.block_sizes) <= 65536
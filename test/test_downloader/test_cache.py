@@ -0,0 +1,105 @@
+# coding=utf-8
+import os
+from pathlib import Path
+
+import pytest
+from mockito import verify, when
+
+import elib.hash_
+from elib import downloader
+
+
+@pytest.fixture(name='cache')
+def _cache():
+    return downloader.DownloadCache('cache')
+
+
+def test_cache_miss_then_hit(local_url, payload, cache):
+    hexdigest = elib.hash_.get_hash(payload)
+    assert downloader.download(local_url, 'test1', hexdigest=hexdigest, cache=cache)
+    assert cache.path_for('md5', hexdigest).read_bytes() == payload
+    when(downloader.Downloader)._create_response(...)
+    assert downloader.download(local_url, 'test2', hexdigest=hexdigest.upper(), cache=cache, stream=True)
+    verify(downloader.Downloader, times=0)._create_response(...)
+    assert Path('test2').read_bytes() == payload
+
+
+@pytest.mark.parametrize('cached', [True, False])
+def test_download_looks_cache_up_once(local_url, payload, cache, monkeypatch, cached):
+    hexdigest = elib.hash_.get_hash(payload)
+    if cached:
+        Path('source').write_bytes(payload)
+        cache.store('source', 'md5', hexdigest)
+    calls = []
+    fetch = cache.fetch
+    monkeypatch.setattr(cache, 'fetch', lambda *args: calls.append(args) or fetch(*args))
+    collected = []
+    assert downloader.download(local_url, 'test', hexdigest=hexdigest, cache=cache, metrics_hook=collected.append)
+    assert len(calls) == 1
+    assert collected[0].cached is cached
+    assert Path('test').read_bytes() == payload
+
+
+def test_cache_stream(local_url, payload, cache):
+    hexdigest = elib.hash_.get_hash(payload)
+    assert downloader.Downloader(local_url, 'test', hexdigest=hexdigest, stream=True, cache=cache).download()
+    assert cache.path_for('md5', hexdigest).exists()
+
+
+def test_cache_not_populated_without_digest(local_url, cache):
+    assert downloader.download(local_url, 'test', cache=cache)
+    assert cache.size() == 0
+
+
+def test_cache_not_populated_on_wrong_digest(local_url, cache):
+    assert not downloader.download(local_url, 'test', hexdigest='nope', cache=cache)
+    assert cache.size() == 0
+
+
+@pytest.mark.parametrize('link', [True, False])
+def test_cache_fetch(cache, link):
+    cache.link = link
+    Path('source').write_bytes(b'content')
+    cache.store('source', 'sha256', 'ABCD')
+    assert cache.fetch('sha256', 'abcd', 'target')
+    assert Path('target').read_bytes() == b'content'
+    assert not cache.fetch('md5', 'abcd', 'other')
+
+
+def test_cache_link_fallback(cache):
+    cache.link = True
+    when(os).link(...).thenRaise(OSError)
+    Path('source').write_bytes(b'content')
+    cache.store('source', 'md5', 'abcd')
+    assert cache.path_for('md5', 'abcd').read_bytes() == b'content'
+
+
+@pytest.mark.parametrize('link', [True, False])
+@pytest.mark.parametrize('stream', [True, False])
+def test_cache_entry_not_overwritten_by_target(local_url, payload, http_handler, monkeypatch, cache, link, stream):
+    cache.link = link
+    hexdigest = elib.hash_.get_hash(payload)
+    assert downloader.download(local_url, 'out', hexdigest=hexdigest, cache=cache, stream=stream)
+    monkeypatch.setattr(http_handler, 'payload', b'other content')
+    assert downloader.download(local_url, 'out', stream=stream)
+    assert Path('out').read_bytes() == b'other content'
+    assert cache.path_for('md5', hexdigest).read_bytes() == payload
+    assert downloader.Downloader(local_url, 'again', hexdigest=hexdigest, cache=cache).download()
+    assert Path('again').read_bytes() == payload
+
+
+def test_cache_eviction():
+    cache = downloader.DownloadCache('cache', max_size=30)
+    for index in range(3):
+        Path(f'source{index}').write_bytes(b'x' * 10)
+        cache.store(f'source{index}', 'md5', str(index))
+        os.utime(str(cache.path_for('md5', str(index))), (index, index))
+    assert cache.fetch('md5', '0', 'target')
+    cache.max_size = 25
+    Path('source3').write_bytes(b'x' * 10)
+    cache.store('source3', 'md5', '3')
+    assert cache.size() == 20
+    assert cache.path_for('md5', '0').exists()
+    assert not cache.path_for('md5', '1').exists()
+    assert not cache.path_for('md5', '2').exists()
+    assert cache.path_for('md5', '3').exists()
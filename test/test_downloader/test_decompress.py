@@ -0,0 +1,220 @@
+# coding=utf-8
+import bz2
+import gzip
+import io
+import lzma
+import tarfile
+from pathlib import Path
+
+import pytest
+
+import elib.hash_
+from elib import downloader
+from elib.downloader._decompress import OUTPUT_SIZE, BlockReader, DecompressingWriter, detect_compression
+
+
+def _tar(members: dict, mode: str = 'w:gz') -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode=mode) as tar:
+        for name, content in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize(
+    'url,expected',
+    [
+        ('http://host/file.tar.gz', 'gzip'),
+        ('http://host/file.TGZ?query=1', 'gzip'),
+        ('http://host/file.bz2', 'bz2'),
+        ('http://host/file.xz', 'xz'),
+        ('http://host/file.zip', None),
+        ('http://host/file', None),
+    ]
+)
+def test_detect_compression(url, expected):
+    assert detect_compression(url) == expected
+
+
+@pytest.mark.parametrize('method,compress', [('gzip', gzip.compress), ('bz2', bz2.compress), ('xz', lzma.compress)])
+def test_decompressing_writer(method, compress):
+    data = b'some data' * 1000
+    compressed = compress(data) + compress(data)
+    output = io.BytesIO()
+    writer = DecompressingWriter(output, method)
+    for index in range(0, len(compressed), 7):
+        writer.write(compressed[index:index + 7])
+    writer.finish()
+    assert output.getvalue() == data * 2
+
+
+def test_decompressing_writer_truncated():
+    writer = DecompressingWriter(io.BytesIO(), 'gzip')
+    writer.write(gzip.compress(b'some data')[:-4])
+    with pytest.raises(EOFError):
+        writer.finish()
+
+
+def test_decompressing_writer_unsupported():
+    with pytest.raises(ValueError):
+        DecompressingWriter(io.BytesIO(), 'zip')
+
+
+class _Recorder:
+
+    def __init__(self):
+        self.hash = elib.hash_.new_hash('md5')
+        self.largest = 0
+
+    def write(self, data: bytes):
+        self.hash.update(data)
+        self.largest = max(self.largest, len(data))
+
+
+@pytest.mark.parametrize('method,compress', [('gzip', gzip.compress), ('bz2', bz2.compress), ('xz', lzma.compress)])
+def test_decompressing_writer_bounded_output(method, compress):
+    data = bytes(32 * 1024 * 1024)
+    compressed = compress(data) * 2
+    output = _Recorder()
+    writer = DecompressingWriter(output, method)
+    writer.write(compressed)
+    writer.finish()
+    assert output.hash.hexdigest() == elib.hash_.get_hash(data * 2).lower()
+    assert output.largest <= OUTPUT_SIZE
+
+
+def test_download_decompress_unsupported(local_url):
+    with pytest.raises(ValueError):
+        downloader.Downloader(local_url, 'test', decompress='zip')
+    assert not Path('test.part').exists()
+
+
+def test_block_reader():
+    blocks = [b'', b'abcdefgh', b'ij', b'', b'klmnopqrstu']
+    reader = BlockReader(iter(blocks))
+    pieces = []
+    buffer = bytearray(3)
+    while True:
+        size = reader.readinto(buffer)
+        if not size:
+            break
+        pieces.append(bytes(buffer[:size]))
+    assert b''.join(pieces) == b''.join(blocks)
+    assert max(len(piece) for piece in pieces) == 3
+    assert reader.received == 21
+
+
+def test_block_reader_exhaust():
+    reader = BlockReader(iter([b'abcd', b'efgh']))
+    assert reader.read(2) == b'ab'
+    reader.exhaust()
+    assert reader.received == 8
+    assert reader.read(2) == b''
+
+
+@pytest.mark.parametrize('mirrors', [False, True])
+def test_download_decompress(local_url, payload, http_handler, monkeypatch, mirrors):
+    compressed = gzip.compress(payload)
+    monkeypatch.setattr(http_handler, 'payload', compressed)
+    downloader_ = downloader.Downloader(
+        local_url, 'test', hexdigest=elib.hash_.get_hash(compressed), decompress='gzip',
+        mirrors=[local_url] if mirrors else (),
+    )
+    assert downloader_.download()
+    assert Path('test').read_bytes() == payload
+    assert not Path('test.part').exists()
+
+
+def test_download_decompress_failover(local_url, payload, http_handler, monkeypatch):
+    compressed = gzip.compress(payload, compresslevel=0)
+    monkeypatch.setattr(http_handler, 'payload', compressed)
+    downloader_ = downloader.Downloader(
+        local_url.replace('/payload', '/broken'), 'test', hexdigest=elib.hash_.get_hash(compressed),
+        decompress='gzip', mirrors=[local_url],
+    )
+    assert downloader_.download()
+    assert Path('test').read_bytes() == payload
+
+
+def test_download_decompress_invalid(local_url, payload):
+    assert not downloader.download(local_url, 'test', decompress='gzip')
+    assert not Path('test').exists()
+    assert not Path('test.part').exists()
+
+
+def test_download_decompress_wrong_hash(local_url, payload, http_handler, monkeypatch):
+    monkeypatch.setattr(http_handler, 'payload', gzip.compress(payload))
+    assert not downloader.download(local_url, 'test', hexdigest=elib.hash_.get_hash(payload), decompress='gzip')
+    assert not Path('test').exists()
+
+
+def test_download_decompress_auto(local_url, payload, http_handler, monkeypatch):
+    monkeypatch.setattr(http_handler, 'payload', lzma.compress(payload))
+    assert downloader.download(local_url + '.xz', 'test', decompress='auto')
+    assert Path('test').read_bytes() == payload
+
+
+def test_download_decompress_auto_unknown(local_url, payload):
+    downloader_ = downloader.Downloader(local_url, 'test', decompress='auto')
+    assert downloader_.decompress is None
+    assert downloader_.download()
+    assert Path('test').read_bytes() == payload
+
+
+@pytest.mark.parametrize('kwargs', [{'resume': True}, {'segments': 4}])
+def test_download_decompress_incompatible(kwargs):
+    with pytest.raises(ValueError):
+        downloader.Downloader('http://127.0.0.1:1/payload', 'test', decompress='gzip', **kwargs)
+    with pytest.raises(ValueError):
+        downloader.Downloader('http://127.0.0.1:1/payload', 'test', extract=True, **kwargs)
+
+
+@pytest.mark.parametrize('mode', ['w', 'w:gz', 'w:bz2', 'w:xz'])
+def test_download_extract(local_url, payload, http_handler, monkeypatch, mode):
+    archive = _tar({'payload': payload, 'folder/small': b'small'}, mode)
+    monkeypatch.setattr(http_handler, 'payload', archive)
+    assert downloader.download(local_url, 'test', hexdigest=elib.hash_.get_hash(archive), extract=True)
+    assert Path('test/payload').read_bytes() == payload
+    assert Path('test/folder/small').read_bytes() == b'small'
+    assert not Path('test.part').exists()
+
+
+def test_download_extract_replaces_folder(local_url, http_handler, monkeypatch):
+    Path('test').mkdir()
+    Path('test/stale').write_bytes(b'stale')
+    monkeypatch.setattr(http_handler, 'payload', _tar({'fresh': b'fresh'}))
+    assert downloader.download(local_url, 'test', extract=True)
+    assert Path('test/fresh').read_bytes() == b'fresh'
+    assert not Path('test/stale').exists()
+
+
+def test_download_extract_wrong_hash(local_url, http_handler, monkeypatch):
+    Path('test').mkdir()
+    Path('test/previous').write_bytes(b'previous')
+    monkeypatch.setattr(http_handler, 'payload', _tar({'fresh': b'fresh'}))
+    assert not downloader.download(local_url, 'test', hexdigest='wrong', extract=True)
+    assert Path('test/previous').read_bytes() == b'previous'
+    assert not Path('test.part').exists()
+
+
+def test_download_extract_unsafe_members(local_url, http_handler, monkeypatch):
+    monkeypatch.setattr(http_handler, 'payload', _tar({'../outside': b'outside', '/absolute': b'absolute',
+                                                       'inside': b'inside'}))
+    assert downloader.download(local_url, 'test', extract=True)
+    assert Path('test/inside').read_bytes() == b'inside'
+    assert not Path('outside').exists()
+    assert not Path('test/absolute').exists()
+
+
+def test_download_extract_truncated(local_url, payload, http_handler, monkeypatch):
+    monkeypatch.setattr(http_handler, 'payload', _tar({'payload': payload}))
+    assert not downloader.download(local_url.replace('/payload', '/broken'), 'test', extract=True)
+    assert not Path('test').exists()
+    assert not Path('test.part').exists()
+
+
+def test_download_extract_not_an_archive(local_url):
+    assert not downloader.download(local_url, 'test', extract=True)
+    assert not Path('test.part').exists()
@@ -0,0 +1,295 @@
+# coding=utf-8
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pytest
+import requests
+import urllib3
+from mockito import mock, verify, verifyStubbedInvocationsAreUsed, when
+
+import elib.hash_
+from elib import downloader
+
+URL = r'http://ipv4.download.thinkbroadband.com/5MB.zip'
+
+
+def test_download():
+    assert downloader.download(url=URL, outfile='./test', hexdigest='c10201c74dafe928c9a192440b20ff59')
+    assert Path('./test').exists()
+
+
+def test_download_wrong_digest():
+    assert not downloader.download(url=URL, outfile='./test', hexdigest='nope')
+    assert not Path('./test').exists()
+
+
+def test_download_no_digest():
+    assert downloader.download(url=URL, outfile='./test')
+    assert Path('./test').exists()
+
+
+def test_download_no_data():
+    when(downloader.Downloader).download_to_memory(...)
+    assert not downloader.download(url=URL, outfile='./test', hexdigest='6cb91af4ed4c60c11613b75cd1fc6116')
+    verifyStubbedInvocationsAreUsed()
+    assert not Path('./test').exists()
+
+
+def test_download_to_memory_no_data():
+    when(downloader.Downloader)._create_response(...).thenReturn(None)
+    assert not downloader.download(url=URL, outfile='./test', hexdigest='6cb91af4ed4c60c11613b75cd1fc6116')
+    verifyStubbedInvocationsAreUsed()
+    assert not Path('./test').exists()
+
+
+def test_download_delete_failed():
+    Path('./test').touch()
+    assert Path('./test').exists()
+    when(downloader.Downloader)._create_response(...).thenReturn(None)
+    assert not downloader.download(url=URL, outfile='./test', hexdigest='6cb91af4ed4c60c11613b75cd1fc6116')
+    verifyStubbedInvocationsAreUsed()
+    assert not Path('./test').exists()
+
+
+def test_download_request_failed():
+    req = mock()
+    req.ok = False
+    req.reason = 'nope'
+    when(requests.Session).head(...).thenReturn(req)
+    assert not downloader.download(url=URL, outfile='./test', hexdigest='6cb91af4ed4c60c11613b75cd1fc6116',
+                                   probe=True)
+    verifyStubbedInvocationsAreUsed()
+    assert not Path('./test').exists()
+
+
+def test_download_method_not_allowed():
+    req = mock()
+    req.ok = False
+    req.reason = 'Method Not Allowed'
+    when(requests.Session).head(...).thenReturn(req)
+    when(downloader.Downloader).download(...).thenReturn(True)
+    assert downloader.download(url=URL, outfile='./test', hexdigest='6cb91af4ed4c60c11613b75cd1fc6116',
+                               probe=True)
+    verifyStubbedInvocationsAreUsed()
+    assert not Path('./test').exists()
+
+
+def test_download_no_probe(local_url, payload):
+    when(requests.Session).head(...)
+    assert downloader.download(local_url, 'test')
+    verify(requests.Session, times=0).head(...)
+    assert Path('test').read_bytes() == payload
+
+
+@pytest.mark.parametrize('stream', [True, False])
+def test_download_not_found(local_url, stream):
+    Path('test').touch()
+    url = local_url.replace('/payload', '/missing')
+    assert not downloader.download(url, 'test', stream=stream)
+    assert not Path('test').exists()
+
+
+def test_download_resume_part_complete(local_url, payload, monkeypatch, http_handler):
+    Path('test.part').write_bytes(payload)
+    Path('test.part.json').write_text(json.dumps({'url': local_url, 'etag': http_handler.etag}))
+    assert downloader.download(local_url, 'test', resume=True)
+    assert Path('test').read_bytes() == payload
+
+
+def test_download_stream(local_url, payload):
+    hexdigest = elib.hash_.get_hash(payload)
+    downloader_ = downloader.Downloader(local_url, 'test', hexdigest=hexdigest, stream=True)
+    assert downloader_.download()
+    assert Path('test').read_bytes() == payload
+    assert not Path('test.part').exists()
+    assert downloader_.file_binary_data is None
+
+
+def test_download_stream_wrong_digest(local_url):
+    Path('test').touch()
+    assert not downloader.Downloader(local_url, 'test', hexdigest='nope', stream=True).download()
+    assert not Path('test').exists()
+    assert not Path('test.part').exists()
+
+
+def test_download_stream_no_data():
+    when(downloader.Downloader)._create_response(...).thenReturn(None)
+    assert not downloader.Downloader(URL, 'test', stream=True).download()
+    verifyStubbedInvocationsAreUsed()
+    assert not Path('test.part').exists()
+
+
+def test_download_to_memory_local(local_url, payload):
+    downloader_ = downloader.Downloader(local_url, 'test')
+    downloader_.download_to_memory()
+    assert downloader_.file_binary_data == payload
+
+
+@pytest.mark.parametrize('stream', [True, False])
+def test_download_incremental_hash(local_url, stream, payload):
+    when(elib.hash_).get_hash(...)
+    hexdigest = hashlib.sha256(payload).hexdigest()
+    downloader_ = downloader.Downloader(local_url, 'test', hexdigest=hexdigest, hash_method='sha256', stream=stream)
+    assert downloader_.download()
+    verify(elib.hash_, times=0).get_hash(...)
+    assert Path('test').read_bytes() == payload
+
+
+@pytest.mark.parametrize(
+    'content_length,segments,ranges',
+    [
+        (10, 1, [(0, 9)]),
+        (10, 3, [(0, 3), (4, 6), (7, 9)]),
+        (2, 4, [(0, 0), (1, 1)]),
+    ]
+)
+def test_split_ranges(content_length, segments, ranges):
+    assert downloader.Downloader._split_ranges(content_length, segments) == ranges
+
+
+@pytest.mark.parametrize('stream', [True, False])
+def test_download_segmented(local_url, stream, payload):
+    hexdigest = elib.hash_.get_hash(payload)
+    assert downloader.Downloader(local_url, 'test', hexdigest=hexdigest, segments=4, stream=stream).download()
+    assert Path('test').read_bytes() == payload
+    assert not Path('test.part').exists()
+
+
+def test_download_segmented_pool_not_full(local_url, payload, caplog):
+    assert downloader.Downloader(local_url, 'test', segments=16).download()
+    assert Path('test').read_bytes() == payload
+    assert 'Connection pool is full' not in caplog.text
+
+
+def test_download_segmented_broken_range(local_url, monkeypatch, http_handler):
+    monkeypatch.setattr(http_handler, 'fail_after', 1000)
+    assert not downloader.download(local_url, 'test', segments=4)
+    assert not Path('test').exists()
+    assert not Path('test.part').exists()
+
+
+class _BrokenRange:
+    status = 206
+
+    def __init__(self):
+        self.released = False
+
+    @staticmethod
+    def readinto(_):
+        raise urllib3.exceptions.ProtocolError('Connection broken')
+
+    def release_conn(self):
+        self.released = True
+
+
+def test_download_range_broken_connection():
+    response = _BrokenRange()
+    downloader_ = downloader.Downloader('http://127.0.0.1:1/payload', 'test', segments=2)
+    when(downloader_)._create_response(...).thenReturn(response)
+    Path('test.part').write_bytes(bytes(10))
+    assert not downloader_._download_range(0, 9, downloader.SharedProgress(downloader.NullProgress()))
+    assert response.released
+
+
+def test_download_segmented_wrong_digest(local_url):
+    assert not downloader.Downloader(local_url, 'test', hexdigest='nope', segments=4).download()
+    assert not Path('test').exists()
+    assert not Path('test.part').exists()
+
+
+def test_download_segmented_no_ranges(local_url, monkeypatch, payload, http_handler):
+    monkeypatch.setattr(http_handler, 'accept_ranges', False)
+    downloader_ = downloader.Downloader(local_url, 'test', segments=4)
+    assert downloader_.download_segmented() is None
+    assert downloader_.download()
+    assert Path('test').read_bytes() == payload
+
+
+@pytest.mark.parametrize('honor_accept_encoding', [True, False])
+@pytest.mark.parametrize('kwargs', [{}, {'stream': True}, {'resume': True}, {'segments': 4}])
+def test_download_content_encoding(local_url, monkeypatch, http_handler, payload, honor_accept_encoding, kwargs):
+    monkeypatch.setattr(http_handler, 'content_encoding', 'gzip')
+    monkeypatch.setattr(http_handler, 'honor_accept_encoding', honor_accept_encoding)
+    hexdigest = elib.hash_.get_hash(payload)
+    assert downloader.Downloader(local_url, 'test', hexdigest=hexdigest, **kwargs).download()
+    assert Path('test').read_bytes() == payload
+
+
+def test_download_resume_segmented():
+    with pytest.raises(ValueError):
+        downloader.Downloader('http://127.0.0.1:1/payload', 'test', resume=True, segments=4)
+
+
+def _interrupted_download(local_url, monkeypatch, http_handler, hexdigest=None):
+    monkeypatch.setattr(http_handler, 'fail_after', 300000)
+    downloader_ = downloader.Downloader(local_url, 'test', hexdigest=hexdigest, resume=True)
+    assert not downloader_.download()
+    received = json.loads(Path('test.part.json').read_text())['received']
+    assert 0 < received == Path('test.part').stat().st_size
+    monkeypatch.setattr(http_handler, 'fail_after', None)
+    return downloader_
+
+
+def test_download_resume(local_url, monkeypatch, payload, http_handler):
+    hexdigest = elib.hash_.get_hash(payload)
+    _interrupted_download(local_url, monkeypatch, http_handler, hexdigest)
+    assert downloader.download(local_url, 'test', hexdigest=hexdigest, resume=True)
+    assert Path('test').read_bytes() == payload
+    assert not Path('test.part').exists()
+    assert not Path('test.part.json').exists()
+
+
+def test_download_resume_remote_changed(local_url, monkeypatch, payload, http_handler):
+    _interrupted_download(local_url, monkeypatch, http_handler)
+    monkeypatch.setattr(http_handler, 'etag', '"changed"')
+    downloader_ = downloader.Downloader(local_url, 'test', hexdigest=elib.hash_.get_hash(payload), resume=True)
+    assert downloader_.download()
+    assert Path('test').read_bytes() == payload
+
+
+def test_download_resume_other_url(local_url, monkeypatch, http_handler):
+    _interrupted_download(local_url, monkeypatch, http_handler)
+    downloader_ = downloader.Downloader(local_url + '?other', 'test', resume=True)
+    assert downloader_._resume_headers() == (None, 0)
+
+
+def test_download_interrupted_no_resume(local_url, monkeypatch, http_handler):
+    monkeypatch.setattr(http_handler, 'fail_after', 300000)
+    assert not downloader.Downloader(local_url, 'test', stream=True).download()
+    assert not Path('test.part').exists()
+    assert not Path('test.part.json').exists()
+
+
+@pytest.mark.parametrize('fallocate', [True, False])
+def test_download_stream_preallocate(local_url, monkeypatch, payload, fallocate):
+    calls = []
+    if fallocate:
+        monkeypatch.setattr(os, 'posix_fallocate', lambda fd, offset, size: calls.append(size), raising=False)
+    else:
+        monkeypatch.delattr(os, 'posix_fallocate', raising=False)
+    assert downloader.Downloader(local_url, 'test', stream=True).download()
+    assert Path('test').read_bytes() == payload
+    assert calls == ([len(payload)] if fallocate else [])
+
+
+def test_download_stream_preallocate_fails(local_url, monkeypatch, payload):
+    def _fail(*_):
+        raise OSError('not supported')
+
+    monkeypatch.setattr(os, 'posix_fallocate', _fail, raising=False)
+    assert downloader.Downloader(local_url, 'test', stream=True).download()
+    assert Path('test').read_bytes() == payload
+
+
+def test_read_blocks_reuse_buffer(local_url, payload):
+    downloader_ = downloader.Downloader(local_url, 'test', block_size=4096)
+    received = bytearray()
+    buffers = set()
+    for block in downloader_._read_blocks(downloader_._create_response(), reuse_buffer=True):
+        if isinstance(block, memoryview):
+            buffers.add(id(block.obj))
+        received.extend(block)
+    assert received == payload
+    assert len(buffers) < 10
@@ -0,0 +1,44 @@
+# coding=utf-8
+from pathlib import Path
+
+from mockito import when
+
+import elib.hash_
+from elib import downloader
+
+
+def test_download_many(local_url, payload):
+    hexdigest = elib.hash_.get_hash(payload)
+    items = [(f'{local_url}?{index}', f'test{index}', hexdigest) for index in range(5)]
+    results = downloader.download_many(items, max_workers=3)
+    assert [result.outfile for result in results] == [Path(f'test{index}').absolute() for index in range(5)]
+    assert all(result.success for result in results)
+    for index in range(5):
+        assert Path(f'test{index}').read_bytes() == payload
+
+
+def test_download_many_duplicates(local_url, payload):
+    hexdigest = elib.hash_.get_hash(payload)
+    items = [(local_url, 'test1'), (local_url, 'test2', hexdigest), (local_url, 'test3', 'nope')]
+    downloads = []
+    when(downloader.Downloader).download().thenAnswer(lambda: downloads.append(1) or True)
+    when(downloader._many.shutil).copyfile(...)
+    results = downloader.download_many(items)
+    assert len(downloads) == 1
+    assert [result.success for result in results] == [True, True, False]
+    assert results[2].error == 'conflicting hexdigest for the same URL'
+
+
+def test_download_many_failure(local_url):
+    items = [(local_url, 'test1', 'nope'), (f'{local_url}?other', 'test2')]
+    results = downloader.download_many(items)
+    assert not results[0].success
+    assert results[0].error == 'download failed'
+    assert results[1].success
+    assert not Path('test1').exists()
+
+
+def test_download_many_exception(local_url):
+    when(downloader.Downloader).download().thenRaise(ValueError('boom'))
+    results = downloader.download_many([(local_url, 'test1'), (local_url, 'test2')])
+    assert [result.error for result in results] == ['boom', 'boom']
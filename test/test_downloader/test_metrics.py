@@ -0,0 +1,94 @@
+# coding=utf-8
+import json
+
+import pytest
+from mockito import mock
+
+import elib.hash_
+from elib import downloader
+
+
+def test_metrics_block_history():
+    metrics = downloader.DownloadMetrics('url')
+    metrics.record_block(1, 0.0, 16)
+    for size in (16, 32, 32, 64):
+        metrics.record_block(size, 0.001, size * 2)
+    assert metrics.bytes_received == 145
+    assert metrics.block_sizes == [16, 32, 64, 128]
+    assert metrics.time_to_first_byte is not None
+    assert metrics.p95_block_throughput == pytest.approx(32000, rel=0.05)
+
+
+def test_metrics_percentile_constant_memory():
+    metrics = downloader.DownloadMetrics('url')
+    for index in range(100000):
+        metrics.record_block(1000, 1000 / (index % 100 + 1), 16)
+    assert metrics.p95_block_throughput == pytest.approx(95, rel=0.05)
+    assert len(metrics._rate_histogram) == downloader._metrics.HISTOGRAM_SIZE  # pylint: disable=protected-access
+    assert json.dumps(metrics.as_dict())
+
+
+def test_metrics_retries():
+    metrics = downloader.DownloadMetrics('url')
+    response = mock({'retries': mock({'history': ('first', 'second')})})
+    metrics.record_response(response)
+    metrics.record_response(mock({'retries': None}))
+    assert metrics.retries == 2
+    assert metrics.time_to_headers is not None
+
+
+def test_metrics_empty():
+    metrics = downloader.DownloadMetrics('url')
+    metrics.finish(False, 'url')
+    assert metrics.average_throughput is None
+    assert metrics.p95_block_throughput is None
+    assert metrics.as_dict()['success'] is False
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'stream': True}, {'segments': 4}])
+def test_download_metrics(local_url, payload, kwargs):
+    collected = []
+    assert downloader.download(local_url, 'test', metrics_hook=collected.append, **kwargs)
+    metrics, = collected
+    assert metrics.success
+    assert metrics.bytes_received == len(payload)
+    assert 0 < metrics.time_to_headers <= metrics.time_to_first_byte <= metrics.duration
+    assert metrics.average_throughput > 0
+    assert metrics.p95_block_throughput > 0
+    assert metrics.block_sizes
+    assert json.dumps(metrics.as_dict())
+
+
+def test_download_metrics_failed():
+    downloader_ = downloader.Downloader('http://127.0.0.1:1/payload', 'test', download_retries=1)
+    assert not downloader_.download()
+    assert downloader_.metrics.success is False
+    assert downloader_.metrics.bytes_received == 0
+    assert downloader_.metrics.time_to_headers is None
+
+
+def test_download_metrics_failover(local_url):
+    mirror = local_url.replace('/payload', '/slow')
+    downloader_ = downloader.Downloader(local_url.replace('/payload', '/broken'), 'test', mirrors=[mirror])
+    assert downloader_.download()
+    assert downloader_.metrics.failovers == 1
+    assert downloader_.metrics.source == mirror
+
+
+def test_download_metrics_cached(local_url, payload, tmpdir):
+    cache = downloader.DownloadCache(str(tmpdir.join('cache')))
+    hexdigest = elib.hash_.get_hash(payload)
+    assert downloader.download(local_url, 'first', hexdigest=hexdigest, cache=cache)
+    downloader_ = downloader.Downloader(local_url, 'second', hexdigest=hexdigest, cache=cache)
+    assert downloader_.download()
+    assert downloader_.metrics.cached
+    assert downloader_.metrics.bytes_received == 0
+
+
+def test_download_function_metrics_cached(local_url, payload, tmpdir):
+    cache = downloader.DownloadCache(str(tmpdir.join('cache')))
+    hexdigest = elib.hash_.get_hash(payload)
+    assert downloader.download(local_url, 'first', hexdigest=hexdigest, cache=cache)
+    collected = []
+    assert downloader.download(local_url, 'second', hexdigest=hexdigest, cache=cache, metrics_hook=collected.append)
+    assert [metrics.cached for metrics in collected] == [True]
@@ -0,0 +1,67 @@
+# coding=utf-8
+from pathlib import Path
+
+import pytest
+
+import elib.hash_
+from elib import downloader
+
+
+def _url(local_url, path):
+    return local_url.replace('/payload', path)
+
+
+def test_mirrors_fastest(local_url, payload):
+    downloader_ = downloader.Downloader(
+        _url(local_url, '/slow'), 'test', hexdigest=elib.hash_.get_hash(payload), mirrors=[local_url],
+    )
+    assert downloader_.download()
+    assert downloader_.active_url == local_url
+    assert Path('test').read_bytes() == payload
+
+
+def test_mirrors_unreachable(local_url, payload):
+    downloader_ = downloader.Downloader(
+        'http://127.0.0.1:1/payload', 'test', mirrors=[local_url], download_retries=0,
+    )
+    assert downloader_.download()
+    assert downloader_.active_url == local_url
+    assert Path('test').read_bytes() == payload
+
+
+@pytest.mark.parametrize('resume', [True, False])
+def test_mirrors_failover(local_url, payload, resume):
+    downloader_ = downloader.Downloader(
+        _url(local_url, '/broken'), 'test', hexdigest=elib.hash_.get_hash(payload),
+        mirrors=[_url(local_url, '/slow')], resume=resume,
+    )
+    assert downloader_.download()
+    assert downloader_.active_url == _url(local_url, '/slow')
+    assert Path('test').read_bytes() == payload
+
+
+def test_mirrors_failover_no_ranges(local_url, payload, http_handler, monkeypatch):
+    monkeypatch.setattr(http_handler, 'accept_ranges', False)
+    downloader_ = downloader.Downloader(
+        _url(local_url, '/broken'), 'test', mirrors=[_url(local_url, '/slow')],
+    )
+    assert not downloader_.download()
+    assert not Path('test').exists()
+    assert not Path('test.part').exists()
+
+
+def test_mirrors_none_available():
+    downloader_ = downloader.Downloader(
+        'http://127.0.0.1:1/payload', 'test', mirrors=['http://127.0.0.1:1/other'], download_retries=0,
+    )
+    assert not downloader_.download()
+
+
+def test_mirrors_stall(local_url, payload):
+    downloader_ = downloader.Downloader(
+        _url(local_url, '/stall'), 'test', hexdigest=elib.hash_.get_hash(payload),
+        mirrors=[_url(local_url, '/slow')], stall_timeout=1,
+    )
+    assert downloader_.download()
+    assert downloader_.active_url == _url(local_url, '/slow')
+    assert Path('test').read_bytes() == payload
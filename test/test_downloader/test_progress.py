@@ -0,0 +1,89 @@
+# coding=utf-8
+import time
+
+from mockito import verify, when
+
+from elib import downloader
+from elib.downloader import _progress
+
+
+class _Recorder(downloader.ProgressReporter):
+
+    def __init__(self):
+        self.calls = []
+
+    def start(self, description, total, initial=0):
+        self.calls.append(('start', total, initial))
+
+    def update(self, amount):
+        self.calls.append(('update', amount))
+
+    def finish(self):
+        self.calls.append(('finish',))
+
+
+def test_progress_reporter(local_url, payload):
+    recorder = _Recorder()
+    assert downloader.Downloader(local_url, 'test', progress=recorder).download()
+    assert recorder.calls[0] == ('start', len(payload), 0)
+    assert recorder.calls[-1] == ('finish',)
+    assert sum(call[1] for call in recorder.calls if call[0] == 'update') == len(payload)
+
+
+def test_progress_segmented(local_url, payload):
+    recorder = _Recorder()
+    assert downloader.Downloader(local_url, 'test', progress=recorder, segments=4).download()
+    assert recorder.calls[0] == ('start', len(payload), 0)
+    assert recorder.calls[-1] == ('finish',)
+    assert sum(call[1] for call in recorder.calls if call[0] == 'update') == len(payload)
+
+
+def test_null_progress(local_url):
+    when(_progress.tqdm).tqdm(...)
+    assert downloader.Downloader(local_url, 'test', progress=downloader.NullProgress()).download()
+    verify(_progress.tqdm, times=0).tqdm(...)
+
+
+def test_callback_progress_throttled():
+    statuses = []
+    progress = downloader.CallbackProgress(statuses.append, max_rate=1)
+    progress.start('test', 100)
+    for _ in range(10):
+        progress.update(10)
+    progress.finish()
+    assert [status['status'] for status in statuses] == ['finished']
+    assert statuses[-1]['downloaded'] == 100
+    assert statuses[-1]['percent_complete'] == '100.0'
+
+
+def test_callback_progress_unthrottled():
+    statuses = []
+    progress = downloader.CallbackProgress(statuses.append, max_rate=0)
+    progress.start('test', None, initial=50)
+    time.sleep(0.01)
+    progress.update(10)
+    progress.finish()
+    assert statuses[0] == {
+        'total': None,
+        'downloaded': 60,
+        'status': 'downloading',
+        'percent_complete': '-.-%',
+        'time': '--:--',
+    }
+    assert statuses[1]['status'] == 'finished'
+
+
+def test_calc_eta():
+    assert _progress._calc_eta(0, 10, 100, 50) == '00:10'
+    assert _progress._calc_eta(0, 10, None, 50) == '--:--'
+    assert _progress._calc_eta(0, 10, 100, 0) == '--:--'
+    assert _progress._calc_eta(0, 1, 10 ** 9, 1) == '--:--'
+
+
+def test_shared_progress():
+    recorder = _Recorder()
+    shared = downloader.SharedProgress(recorder)
+    shared.start('test', 10)
+    shared.update(5)
+    shared.finish()
+    assert recorder.calls == [('update', 5)]
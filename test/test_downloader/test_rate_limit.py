@@ -0,0 +1,59 @@
+# coding=utf-8
+import asyncio
+import time
+
+import pytest
+
+from elib import downloader
+
+
+@pytest.fixture(autouse=True)
+def _reset_global_limit():
+    yield
+    downloader.set_global_rate_limit(None)
+
+
+def test_rate_limiter_reserve():
+    limiter = downloader.RateLimiter(1000, burst=100)
+    assert limiter.reserve(100) == 0
+    assert limiter.reserve(100) == pytest.approx(0.1, abs=0.01)
+    assert limiter.reserve(100) == pytest.approx(0.2, abs=0.01)
+
+
+def test_rate_limiter_invalid():
+    with pytest.raises(ValueError):
+        downloader.RateLimiter(0)
+
+
+def test_global_rate_limit():
+    assert downloader.get_global_rate_limit() is None
+    downloader.set_global_rate_limit(1000)
+    assert downloader.get_global_rate_limit().rate == 1000
+    downloader.set_global_rate_limit(None)
+    assert downloader.get_global_rate_limit() is None
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'segments': 4}])
+def test_download_rate_limit(local_url, payload, kwargs):
+    limiter = downloader.RateLimiter(4 * 1024 * 1024, burst=256 * 1024)
+    start = time.monotonic()
+    assert downloader.download(local_url, 'test', rate_limit=limiter, **kwargs)
+    assert time.monotonic() - start > 0.15
+
+
+def test_download_global_rate_limit(local_url, payload):
+    downloader.set_global_rate_limit(4 * 1024 * 1024, burst=256 * 1024)
+    downloader_ = downloader.Downloader(local_url, 'test')
+    start = time.monotonic()
+    assert downloader_.download()
+    assert time.monotonic() - start > 0.15
+    assert downloader_.block_size <= 256 * 1024
+
+
+def test_async_download_rate_limit(local_url, payload):
+    limiter = downloader.RateLimiter(4 * 1024 * 1024, burst=256 * 1024)
+    start = time.monotonic()
+    assert asyncio.get_event_loop().run_until_complete(
+        downloader.async_download(local_url, 'test', rate_limit=limiter)
+    )
+    assert time.monotonic() - start > 0.15
@@ -0,0 +1,72 @@
+# coding=utf-8
+import os
+from pathlib import Path
+
+import pytest
+from mockito import verify, when
+
+import elib.hash_
+from elib import downloader
+
+
+@pytest.fixture(name='validators')
+def _validators():
+    return downloader.ValidatorStore('validators.json')
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'stream': True}, {'segments': 4}])
+def test_revalidation(local_url, payload, validators, kwargs):
+    assert downloader.download(local_url, 'test', validators=validators, **kwargs)
+    assert Path('test').read_bytes() == payload
+    when(downloader.Downloader)._write_to_file()
+    when(os).replace(...)
+    downloader_ = downloader.Downloader(local_url, 'test', validators=validators, **kwargs)
+    assert downloader_.download()
+    assert downloader_.not_modified
+    verify(downloader.Downloader, times=0)._write_to_file()
+    verify(os, times=0).replace(...)
+
+
+def test_revalidation_remote_changed(local_url, payload, validators, http_handler, monkeypatch):
+    assert downloader.download(local_url, 'test', validators=validators)
+    monkeypatch.setattr(http_handler, 'etag', '"changed"')
+    downloader_ = downloader.Downloader(local_url, 'test', validators=validators)
+    assert downloader_.download()
+    assert not downloader_.not_modified
+    assert downloader.ValidatorStore('validators.json').headers_for(local_url, 'test') == {
+        'If-None-Match': '"changed"'
+    }
+
+
+def test_revalidation_local_file_changed(local_url, validators):
+    assert downloader.download(local_url, 'test', validators=validators)
+    Path('test').write_bytes(b'local changes')
+    assert validators.headers_for(local_url, 'test') == {}
+    downloader_ = downloader.Downloader(local_url, 'test', validators=validators)
+    assert downloader_.download()
+    assert not downloader_.not_modified
+
+
+def test_revalidation_skipped_with_hexdigest(local_url, payload, validators):
+    assert downloader.download(local_url, 'test', validators=validators)
+    downloader_ = downloader.Downloader(local_url, 'test', hexdigest=elib.hash_.get_hash(payload),
+                                        validators=validators)
+    assert downloader_.download()
+    assert not downloader_.not_modified
+
+
+def test_validator_store():
+    Path('file').write_bytes(b'content')
+    store = downloader.ValidatorStore('validators.json')
+    store.update('url', 'file', {'ETag': '"etag"', 'Last-Modified': 'date'})
+    store = downloader.ValidatorStore('validators.json')
+    assert store.headers_for('url', 'file') == {'If-None-Match': '"etag"', 'If-Modified-Since': 'date'}
+    assert store.headers_for('url', 'other') == {}
+    assert store.headers_for('other', 'file') == {}
+    store.update('url', 'file', {})
+    assert store.headers_for('url', 'file') == {}
+
+
+def test_validator_store_corrupt():
+    Path('validators.json').write_text('nope')
+    assert downloader.ValidatorStore('validators.json').headers_for('url', 'file') == {}
@@ -1,4 +1,9 @@
 # coding=utf-8
+import hashlib
+import io
+import os
+import time
+from collections import OrderedDict
 from pathlib import Path
 
 import pytest
@@ -28,3 +33,331 @@ def test_get_hash_from_file():
 def test_get_hash_wrong_method():
     with pytest.raises(AttributeError):
         elib.hash_.get_hash('test', 'nope')
+
+
+def test_new_hash():
+    hash_ = elib.hash_.new_hash('sha256')
+    for chunk in ('this is some ', 'dummy test string'):
+        hash_.update(chunk.encode())
+    assert hash_.hexdigest() == '556d2c0500f5e1e40925e65d16cc3c46006006e88ffc5051fb3a7f7c1b6af9b1'
+
+
+def test_new_hash_wrong_method():
+    with pytest.raises(AttributeError):
+        elib.hash_.new_hash('nope')
+
+
+class _Reader:
+    def __init__(self, *chunks):
+        self.chunks = list(chunks)
+        self.reads = 0
+
+    def read(self, _):
+        self.reads += 1
+        return self.chunks.pop(0) if self.chunks else b''
+
+
+def _expected(data: bytes) -> dict:
+    return {'md5': hashlib.md5(data).hexdigest(), 'sha256': hashlib.sha256(data).hexdigest()}
+
+
+def test_get_hashes_from_string():
+    test_string = 'this is some dummy test string'
+    assert elib.hash_.get_hashes(test_string) == {
+        'md5': 'f4c8f848b02d640c75a2385fd315412b',
+        'sha256': '556d2c0500f5e1e40925e65d16cc3c46006006e88ffc5051fb3a7f7c1b6af9b1',
+    }
+
+
+def test_get_hashes_from_path():
+    data = os.urandom(elib.hash_.CHUNK_SIZE * 2 + 7)
+    test_file = Path('./test_file')
+    test_file.write_bytes(data)
+    assert elib.hash_.get_hashes(test_file) == _expected(data)
+
+
+def test_get_hashes_from_stream():
+    data = os.urandom(elib.hash_.CHUNK_SIZE + 7)
+    assert elib.hash_.get_hashes(io.BytesIO(data)) == _expected(data)
+
+
+def test_get_hashes_methods():
+    hexdigests = elib.hash_.get_hashes(b'data', ['sha1', 'md5', 'sha512'])
+    assert list(hexdigests) == ['sha1', 'md5', 'sha512']
+    assert hexdigests['sha1'] == hashlib.sha1(b'data').hexdigest()
+
+
+def test_get_hashes_single_pass():
+    stream = _Reader(b'da', b'ta')
+    assert elib.hash_.get_hashes(stream) == _expected(b'data')
+    assert stream.reads == 3
+
+
+def test_get_hashes_wrong_method():
+    with pytest.raises(AttributeError):
+        elib.hash_.get_hashes(b'test', ['md5', 'nope'])
+
+
+def test_get_hashes_wrong_type():
+    with pytest.raises(TypeError):
+        elib.hash_.get_hashes(1)
+
+
+@pytest.mark.parametrize('use_mmap', [True, False])
+@pytest.mark.parametrize('size', [0, 1, elib.hash_.CHUNK_SIZE, elib.hash_.CHUNK_SIZE * 3 + 7])
+def test_hash_file(use_mmap, size):
+    data = os.urandom(size)
+    Path('test_file').write_bytes(data)
+    assert elib.hash_.hash_file('test_file', 'sha256', use_mmap=use_mmap) == hashlib.sha256(data).hexdigest()
+    assert elib.hash_.hash_file(Path('test_file'), use_mmap=use_mmap, chunk_size=4096) == hashlib.md5(data).hexdigest()
+
+
+def test_hash_file_missing():
+    with pytest.raises(FileNotFoundError):
+        elib.hash_.hash_file('missing')
+
+
+def test_hash_stream():
+    data = os.urandom(elib.hash_.CHUNK_SIZE * 2 + 7)
+    assert elib.hash_.hash_stream(io.BytesIO(data), 'sha1') == hashlib.sha1(data).hexdigest()
+    with open('test_file', 'wb') as file:
+        file.write(data)
+    with open('test_file', 'rb') as file:
+        assert elib.hash_.hash_stream(file, chunk_size=1000) == hashlib.md5(data).hexdigest()
+
+
+def test_hash_stream_without_readinto():
+    assert elib.hash_.hash_stream(_Reader(b'some ', b'data')) == hashlib.md5(b'some data').hexdigest()
+
+
+def test_hash_stream_wrong_method():
+    with pytest.raises(AttributeError):
+        elib.hash_.hash_stream(io.BytesIO(b'data'), 'nope')
+
+
+@pytest.mark.parametrize('workers', [None, 1, 4])
+def test_hash_files(workers):
+    sizes = [0, 10, elib.hash_.BATCH_SIZE + 1, 4096, elib.hash_.CHUNK_SIZE, 1]
+    paths = []
+    for index, size in enumerate(sizes):
+        path = Path(f'test_file_{index}')
+        path.write_bytes(os.urandom(size))
+        paths.append(path if index % 2 else str(path))
+    hexdigests = elib.hash_.hash_files(paths, 'sha256', workers=workers)
+    assert list(hexdigests) == paths
+    for path, hexdigest in hexdigests.items():
+        assert hexdigest == hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def test_hash_files_empty():
+    assert elib.hash_.hash_files([]) == {}
+
+
+def test_hash_files_missing():
+    with pytest.raises(FileNotFoundError):
+        elib.hash_.hash_files(['missing'])
+
+
+def test_hash_files_wrong_method():
+    Path('test_file').write_bytes(b'data')
+    with pytest.raises(AttributeError):
+        elib.hash_.hash_files(['test_file'], 'nope')
+
+
+def test_batch_by_size(monkeypatch):
+    monkeypatch.setattr(elib.hash_, 'BATCH_SIZE', 100)
+    monkeypatch.setattr(elib.hash_, 'BATCH_COUNT', 3)
+    batches = elib.hash_._batch_by_size([500, 1, 60, 1, 1, 1, 1, 200, 50])
+    assert batches == [[0], [7], [2, 8], [1, 3, 4], [5, 6]]
+
+
+def _old_file(name: str, data: bytes, age: int = 60) -> Path:
+    path = Path(name)
+    path.write_bytes(data)
+    past = time.time() - age
+    os.utime(str(path), (past, past))
+    return path
+
+
+@pytest.fixture(name='hash_calls')
+def _hash_calls(monkeypatch):
+    calls = []
+    hash_file = elib.hash_.hash_file
+
+    def _hash_file(path, *args):
+        calls.append(path)
+        return hash_file(path, *args)
+
+    monkeypatch.setattr(elib.hash_, 'hash_file', _hash_file)
+    return calls
+
+
+def test_hash_cache(hash_calls):
+    path = _old_file('test_file', b'data')
+    with elib.hash_.HashCache('cache.db') as cache:
+        assert cache.get(path) is None
+        assert cache.hash_file(path) == hashlib.md5(b'data').hexdigest()
+        assert cache.hash_file(str(path)) == hashlib.md5(b'data').hexdigest()
+        assert cache.hash_file(path, 'sha256') == hashlib.sha256(b'data').hexdigest()
+    assert len(hash_calls) == 2
+    with elib.hash_.HashCache('cache.db') as cache:
+        assert cache.get(path.absolute()) == hashlib.md5(b'data').hexdigest()
+
+
+def test_hash_cache_modified(hash_calls):
+    path = _old_file('test_file', b'data')
+    with elib.hash_.HashCache('cache.db') as cache:
+        cache.hash_file(path)
+        _old_file('test_file', b'other', age=30)
+        assert cache.hash_file(path) == hashlib.md5(b'other').hexdigest()
+    assert len(hash_calls) == 2
+
+
+def test_hash_cache_recently_modified(hash_calls):
+    Path('test_file').write_bytes(b'data')
+    with elib.hash_.HashCache('cache.db') as cache:
+        cache.hash_file('test_file')
+        assert cache.get('test_file') is None
+        cache.hash_file('test_file')
+    assert len(hash_calls) == 2
+
+
+def test_hash_cache_hash_files(hash_calls):
+    paths = [_old_file(f'test_file_{index}', bytes([index]) * 10) for index in range(5)]
+    with elib.hash_.HashCache('cache.db') as cache:
+        cache.hash_file(paths[1])
+        cache.hash_file(paths[3])
+        hexdigests = cache.hash_files(paths, workers=2)
+        assert list(hexdigests) == paths
+        assert hexdigests == elib.hash_.hash_files(paths)
+        assert all(cache.get(path) for path in paths)
+    assert sorted(hash_calls[:5]) == sorted(paths)
+
+
+def test_hash_cache_evict():
+    paths = [_old_file(f'test_file_{index}', b'data') for index in range(3)]
+    with elib.hash_.HashCache('cache.db') as cache:
+        cache.hash_files(paths)
+        cache.hash_file(paths[0], 'sha1')
+        paths[0].unlink()
+        paths[2].unlink()
+        assert cache.evict() == 2
+        assert cache.evict() == 0
+        assert cache.get(paths[1])
+
+
+def test_hash_cache_missing_file():
+    with elib.hash_.HashCache('cache.db') as cache:
+        with pytest.raises(FileNotFoundError):
+            cache.hash_file('missing')
+
+
+def _tree(files: dict) -> Path:
+    root = Path('tree')
+    for name, data in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    return root
+
+
+_TREE = {'a': b'a', 'dir/b': b'bb', 'dir/sub/c': b'ccc', 'dir/sub/d': b'dddd', 'other/e': b''}
+
+
+def test_hash_tree():
+    manifest = elib.hash_.hash_tree(_tree(_TREE), 'sha256', workers=2)
+    assert list(manifest.entries) == sorted(_TREE)
+    for path, data in _TREE.items():
+        assert manifest.entries[path] == (len(data), hashlib.sha256(data).hexdigest())
+    assert set(manifest.directory_digests) == {'', 'dir', 'dir/sub', 'other'}
+
+
+def test_hash_tree_deterministic():
+    manifest = elib.hash_.hash_tree(_tree(_TREE))
+    shuffled = elib.hash_.TreeManifest('md5', OrderedDict(reversed(list(manifest.entries.items()))))
+    assert shuffled.root_digest == manifest.root_digest
+    assert shuffled.to_json() == manifest.to_json()
+
+
+def test_hash_tree_empty():
+    Path('tree').mkdir()
+    manifest = elib.hash_.hash_tree('tree')
+    assert not manifest.entries
+    assert manifest.root_digest == hashlib.md5().hexdigest()
+
+
+def test_hash_tree_cache(hash_calls):
+    root = _tree(_TREE)
+    for path in root.glob('**/*'):
+        os.utime(str(path), (time.time() - 60, time.time() - 60))
+    with elib.hash_.HashCache('cache.db') as cache:
+        first = elib.hash_.hash_tree(root, cache=cache)
+        second = elib.hash_.hash_tree(root, cache=cache)
+    assert first == second
+    assert len(hash_calls) == len(_TREE)
+
+
+def test_root_digest_changes():
+    manifest = elib.hash_.hash_tree(_tree(_TREE))
+    renamed = elib.hash_.TreeManifest('md5', {('dir/x' if path == 'dir/b' else path): entry
+                                              for path, entry in manifest.entries.items()})
+    moved = elib.hash_.TreeManifest('md5', {('dir/sub/b' if path == 'dir/b' else path): entry
+                                            for path, entry in manifest.entries.items()})
+    digests = {manifest.root_digest, renamed.root_digest, moved.root_digest}
+    assert len(digests) == 3
+    assert renamed.directory_digests['other'] == manifest.directory_digests['other']
+
+
+def test_manifest_diff():
+    before = elib.hash_.hash_tree(_tree(_TREE))
+    Path('tree/dir/sub/c').write_bytes(b'changed')
+    Path('tree/dir/b').unlink()
+    Path('tree/new/f').parent.mkdir()
+    Path('tree/new/f').write_bytes(b'new')
+    after = elib.hash_.hash_tree('tree')
+    assert after.diff(before) == elib.hash_.ManifestDiff(added=['new/f'], removed=['dir/b'], changed=['dir/sub/c'])
+    assert before.diff(after) == elib.hash_.ManifestDiff(added=['dir/b'], removed=['new/f'], changed=['dir/sub/c'])
+    assert after.diff(after) == elib.hash_.ManifestDiff([], [], [])
+
+
+def test_manifest_diff_wrong_method():
+    with pytest.raises(ValueError):
+        elib.hash_.TreeManifest('md5', {}).diff(elib.hash_.TreeManifest('sha1', {}))
+
+
+def test_manifest_json():
+    manifest = elib.hash_.hash_tree(_tree(_TREE))
+    assert elib.hash_.TreeManifest.from_json(manifest.to_json()) == manifest
+    tampered = manifest.to_json().replace(manifest.entries['a'].hexdigest, 'x' * 32)
+    with pytest.raises(ValueError):
+        elib.hash_.TreeManifest.from_json(tampered)
+
+
+@pytest.mark.parametrize('size', [0, 1, 4096, 4096 * 3 + 5])
+def test_hash_file_blocks(size):
+    data = os.urandom(size)
+    Path('test_file').write_bytes(data)
+    digests = elib.hash_.hash_file_blocks('test_file', 'sha1', block_size=4096)
+    assert digests.method == 'sha1'
+    assert digests.size == size
+    assert digests.hexdigest == hashlib.sha1(data).hexdigest()
+    assert digests.blocks == [hashlib.sha1(data[offset:offset + 4096]).hexdigest() for offset in range(0, size, 4096)]
+    assert elib.hash_.verify_blocks('test_file', digests) == []
+
+
+def test_verify_blocks_corrupt():
+    data = bytearray(os.urandom(4096 * 5))
+    Path('test_file').write_bytes(data)
+    digests = elib.hash_.hash_file_blocks('test_file', block_size=4096)
+    data[4096 + 10] ^= 0xFF
+    data[4096 * 4] ^= 0xFF
+    Path('test_file').write_bytes(data)
+    assert elib.hash_.verify_blocks('test_file', digests, workers=2) == [1, 4]
+
+
+def test_verify_blocks_truncated():
+    data = os.urandom(4096 * 3)
+    Path('test_file').write_bytes(data)
+    digests = elib.hash_.hash_file_blocks('test_file', block_size=4096)
+    Path('test_file').write_bytes(data[:4096 + 100])
+    assert elib.hash_.verify_blocks('test_file', digests) == [1, 2]
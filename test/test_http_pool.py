@@ -0,0 +1,122 @@
+# coding=utf-8
+import http.server
+import socketserver
+import threading
+
+import pytest
+import urllib3
+
+from elib import http_pool
+
+
+@pytest.fixture(autouse=True)
+def _reset_pool():
+    http_pool.configure_http_pool()
+    yield
+    http_pool.configure_http_pool()
+
+
+def test_pool_is_shared():
+    assert http_pool.get_http_pool() is http_pool.get_http_pool()
+    assert http_pool.get_session() is http_pool.get_session()
+
+
+def test_session_uses_shared_pool():
+    adapter = http_pool.get_session().get_adapter('https://example.com')
+    assert adapter.poolmanager is http_pool.get_http_pool()
+
+
+def test_configure_http_pool():
+    pool = http_pool.get_http_pool()
+    session = http_pool.get_session()
+    http_pool.configure_http_pool(maxsize=2, connect_timeout=1, read_timeout=2, keep_alive=False)
+    new_pool = http_pool.get_http_pool()
+    assert new_pool is not pool
+    assert http_pool.get_session() is not session
+    assert new_pool.connection_pool_kw['maxsize'] == 2
+    timeout = new_pool.connection_pool_kw['timeout']
+    assert isinstance(timeout, urllib3.Timeout)
+    assert timeout.connect_timeout == 1
+    assert timeout.read_timeout == 2
+
+
+def test_pool_grows_on_demand():
+    session = http_pool.get_session()
+    pool = http_pool.get_http_pool()
+    assert http_pool.get_http_pool(4) is pool
+    pool.connection_from_host('example.com')
+    grown = http_pool.get_http_pool(16)
+    assert grown is not pool
+    assert not pool.pools
+    assert grown.connection_pool_kw['maxsize'] == 16
+    assert http_pool.get_http_pool() is grown
+    assert http_pool.get_session() is session
+    assert session.get_adapter('https://example.com').poolmanager is grown
+
+
+def test_pool_growth_keeps_configured_size():
+    http_pool.configure_http_pool(maxsize=2)
+    assert http_pool.get_http_pool().connection_pool_kw['maxsize'] == 2
+    assert http_pool.get_http_pool(5).connection_pool_kw['maxsize'] == 5
+    assert http_pool._SETTINGS['maxsize'] == 2  # pylint: disable=protected-access
+    http_pool.configure_http_pool(maxsize=3)
+    assert http_pool.get_http_pool().connection_pool_kw['maxsize'] == 3
+
+
+def test_downloader_uses_shared_pool():
+    from elib.downloader import Downloader
+    assert Downloader('url', 'file').http_pool is http_pool.get_http_pool()
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    connections: list = []
+
+    def do_GET(self):  # noqa: N802
+        self.connections.append(self.headers.get('Connection'))
+        self.send_response(200)
+        self.send_header('Content-Length', '4')
+        self.end_headers()
+        self.wfile.write(b'data')
+
+    def log_message(self, *_):
+        pass
+
+
+class _Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture(name='server_url')
+def _server_url():
+    _Handler.connections = []
+    server = _Server(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/data'
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize('keep_alive', [True, False])
+def test_keep_alive_on_the_wire(server_url, keep_alive):
+    from elib.downloader import Downloader, NullProgress
+    http_pool.configure_http_pool(keep_alive=keep_alive)
+    assert http_pool.get_session().get(server_url).content == b'data'
+    for stream in (False, True):
+        assert Downloader(server_url, 'test', stream=stream, progress=NullProgress()).download()
+    assert len(_Handler.connections) == 3
+    assert all((connection == 'close') is not keep_alive for connection in _Handler.connections)
+
+
+def test_connection_headers():
+    assert http_pool.connection_headers({'Range': 'bytes=0-'}) == {'Range': 'bytes=0-'}
+    http_pool.configure_http_pool(keep_alive=False)
+    assert http_pool.connection_headers() == {'Connection': 'close'}
+    assert http_pool.connection_headers({'Range': 'bytes=0-'}) == {'Range': 'bytes=0-', 'Connection': 'close'}
+
+
+def test_downloader_grows_pool():
+    from elib.downloader import Downloader
+    assert Downloader('url', 'file', segments=16).http_pool.connection_pool_kw['maxsize'] == 16
+    assert Downloader('url', 'file', mirrors=['a'] * 20).http_pool.connection_pool_kw['maxsize'] == 21
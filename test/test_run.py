@@ -1,6 +1,8 @@
 # coding=utf-8
 
+import io
 import string
+import subprocess
 
 import delegator
 import pexpect
@@ -172,3 +174,79 @@ def test_failure(process):
     verify(elib.run).std_err('test.exe error:\nerror')
     verify(elib.run, times=0).std_out(...)
     verify(elib.run).error('command failed: test.exe -> 1')
+
+
+class _Popen:
+
+    def __init__(self, out='', err='', return_code=0):
+        self.stdout = io.StringIO(out)
+        self.stderr = io.StringIO(err)
+        self.return_code = return_code
+
+    def wait(self):
+        return self.return_code
+
+
+def _popen(**kwargs):
+    process = _Popen(**kwargs)
+    when(subprocess).Popen(...).thenReturn(process)
+    return process
+
+
+def test_stream():
+    _popen(out='line 1\n\nline 2\r\nfiltered\n', err='warning\n')
+    out, code = elib.run.run('test', stream=True, filters='filtered')
+    verify(delegator, times=0).run(...)
+    verify(elib.run).std_out('line 1')
+    verify(elib.run).std_out('line 2')
+    verify(elib.run, times=0).std_out('filtered')
+    verify(elib.run).std_err('warning')
+    verify(elib.run).info('test.exe -> 0')
+    verify(elib.run, times=0).error(...)
+    assert code == 0
+    assert sorted(out.split('\n')) == ['line 1', 'line 2', 'warning']
+
+
+def test_stream_tail():
+    _popen(out=''.join(f'line {index}\n' for index in range(100)))
+    out, code = elib.run.run('test', stream=True, tail=3)
+    verify(elib.run, times=100).std_out(...)
+    assert code == 0
+    assert out == 'line 97\nline 98\nline 99'
+
+
+def test_stream_muted():
+    _popen(out='output\n')
+    out, code = elib.run.run('test', stream=True, mute=True)
+    verify(elib.run, times=0).std_out(...)
+    verify(elib.run, times=0).info(...)
+    verify(elib.run).cmd_end(' -> 0')
+    assert code == 0
+    assert out == 'output'
+
+
+def test_stream_error():
+    _popen(err='some error\n', return_code=1)
+    out, code = elib.run.run('test', stream=True, failure_ok=True)
+    verify(elib.run).std_err('some error')
+    verify(elib.run).error('command failed: test.exe -> 1')
+    assert code == 1
+    assert out == 'some error'
+
+
+def test_stream_failure():
+    _popen(out=''.join(f'line {index}\n' for index in range(10)), return_code=2)
+    with pytest.raises(SystemExit):
+        elib.run.run('test', stream=True, mute=True, tail=2)
+    verify(elib.run).cmd_end('')
+    verify(elib.run).error('command failed: test.exe -> 2')
+    verify(elib.run).std_err('test.exe error:\nline 8\nline 9')
+    verify(elib.run, times=0).std_out(...)
+
+
+def test_stream_failure_no_output():
+    _popen(return_code=2)
+    with pytest.raises(SystemExit):
+        elib.run.run('test', stream=True, mute=True)
+    verify(elib.run).error('command failed: test.exe -> 2')
+    verify(elib.run, times=0).std_err(...)
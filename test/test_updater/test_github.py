@@ -89,7 +89,7 @@ def test_get_latest_release(dummy_release):
     req = mock(spec=requests.Request)
     req.ok = True
     when(req).json().thenReturn(dummy_release)
-    when(requests).get(rf'https://api.github.com/repos/{repo}/releases/latest', timeout=5).thenReturn(req)
+    when(requests.Session).get(rf'https://api.github.com/repos/{repo}/releases/latest', timeout=5).thenReturn(req)
     release = github.get_latest_release(repo)
     assert isinstance(release, github.Release)
     verifyStubbedInvocationsAreUsed()
@@ -97,7 +97,7 @@ def test_get_latest_release(dummy_release):
 
 def test_get_latest_release_req_timeout(caplog):
     repo = 'owner/repo'
-    when(requests).get(rf'https://api.github.com/repos/{repo}/releases/latest', timeout=5) \
+    when(requests.Session).get(rf'https://api.github.com/repos/{repo}/releases/latest', timeout=5) \
         .thenRaise(requests.exceptions.Timeout)
     assert github.get_latest_release(repo) is None
     assert 'request timed out' in caplog.text
@@ -109,7 +109,7 @@ def test_get_latest_release_req_failed(caplog):
     req = mock(spec=requests.Request)
     req.ok = False
     req.reason = 'testing'
-    when(requests).get(rf'https://api.github.com/repos/{repo}/releases/latest', timeout=5).thenReturn(req)
+    when(requests.Session).get(rf'https://api.github.com/repos/{repo}/releases/latest', timeout=5).thenReturn(req)
     assert github.get_latest_release(repo) is None
     assert 'request failed: testing' in caplog.text
     verifyStubbedInvocationsAreUsed()